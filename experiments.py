@@ -18,7 +18,8 @@ class MyPlannerWrapper(Planner):
             best_heuristic: str,
             worst_heuristic: str,
             size_heuristic: str,
-            selector: str
+            selector: str,
+            task_cache: str = None
             ) -> None:
         
         super().__init__(name, planner_path)
@@ -28,15 +29,21 @@ class MyPlannerWrapper(Planner):
         self.worst_heuristic = worst_heuristic
         self.size_heuristic = size_heuristic
         self.selector = selector
+        self.task_cache = task_cache
 
     def get_cmd(self, domain_path, instance_path, solution_path):
-        return f'python {self.planner_path}/planner.py {domain_path} {instance_path} {solution_path} -m {self.metric} -ch {self.cp_heuristic} -bh {self.best_heuristic} -wh {self.worst_heuristic} -sh {self.size_heuristic} -s {self.selector}'
+        cmd = f'python {self.planner_path}/planner.py {domain_path} {instance_path} {solution_path} -m {self.metric} -ch {self.cp_heuristic} -bh {self.best_heuristic} -wh {self.worst_heuristic} -sh {self.size_heuristic} -s {self.selector}'
+        # Every config grounds the same instances: share the groundings
+        if self.task_cache is not None:
+            cmd += f' -gc {self.task_cache}'
+        return cmd
     
 
 def main():
 
     results_folder = pkg_resources.resource_filename(__name__, 'ICAPS')
     env = Environment(results_folder, name='EVALUATION')
+    task_cache = path.join(results_folder, 'task_cache')
     
     timeout = 600
     configs = [
@@ -95,7 +102,7 @@ def main():
     for config in configs:
         planner_name = "_".join(map(str,list(config)))
 
-        my_planner = MyPlannerWrapper(planner_name, MY_PLANNER_PATH, metric=config[0], cp_heuristic=config[1], best_heuristic=config[2], worst_heuristic=config[3], size_heuristic=config[4], selector=config[5])
+        my_planner = MyPlannerWrapper(planner_name, MY_PLANNER_PATH, metric=config[0], cp_heuristic=config[1], best_heuristic=config[2], worst_heuristic=config[3], size_heuristic=config[4], selector=config[5], task_cache=task_cache)
 
         env.add_run(system=my_planner, domains=all_domains)
     env.set_time(config[6])
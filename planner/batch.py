@@ -0,0 +1,261 @@
+import json
+import multiprocessing
+import resource
+import signal
+import sys
+import time
+
+from pathlib import Path
+
+from planner import boand_star
+from preprocessing import warm_up
+
+# Columns of the .stats rows written by boand_star
+STATS_KEYS = ["best", "worst", "size", "time", "iterations", "expansions", "generations", "max_open",
+              "h_hits", "h_misses", "duplicates", "t_hits", "t_misses", "evaluations", "dominated", "spilled"]
+
+# Seconds given to a job over its time limit to stop by itself (the search
+# stops at the limit, preprocessing does not)
+TIME_GRACE = 5
+
+
+def parse_config(name):
+    # Configurations are named like the result folders of experiments.py:
+    # metric_heuristic_best_worst_size_selector
+    metric, heuristic, best, worst, size, selector = name.split("_")
+    return {
+        "use_metric": metric,
+        "use_cp_heuristic": heuristic,
+        "use_best_case_heuristic": best,
+        "use_worst_case_heuristic": worst,
+        "use_size_heuristic": size,
+        "use_selector": selector}
+
+def format_config(options):
+    # Name of the configuration the options amount to (inverse of parse_config)
+    return "_".join(str(options[key]) for key in ["use_metric", "use_cp_heuristic", "use_best_case_heuristic",
+                                                  "use_worst_case_heuristic", "use_size_heuristic", "use_selector"])
+
+def read_timings(path):
+    timings = dict()
+    if path.exists():
+        for line in path.read_text().splitlines():
+            stage, seconds = line.split(";")
+            timings[stage] = float(seconds)
+    return timings
+
+
+class JobTimeout(Exception):
+    pass
+
+def _raise_timeout(signum, frame):
+    raise JobTimeout()
+
+def get_address_space():
+    # Current virtual memory size of the process, in bytes
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[0]) * resource.getpagesize()
+
+
+def solve(domain_file, problem_file, solution_folder, options, time_limit=None, memory_limit=None):
+    # Runs boand_star in this process. time_limit (seconds) stops the search,
+    # and the whole job TIME_GRACE seconds later; memory_limit (MB) bounds
+    # the memory the job may allocate on top of what the process holds.
+    # Returns the outcome of the job: status, frontier, wall time, last
+    # stats row and preprocessing timings.
+    pname = Path(problem_file).stem
+    record = {"domain": domain_file, "problem": problem_file, "output": solution_folder, "status": "complete"}
+
+    if time_limit is not None:
+        previous_handler = signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, time_limit + TIME_GRACE)
+    if memory_limit is not None:
+        soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+        limit = get_address_space() + int(memory_limit * 1024 * 1024)
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+    start = time.time()
+    frontier = []
+    search = None
+    try:
+        search = boand_star(domain_file, problem_file, solution_folder, time_limit=time_limit, **options)
+        while True:
+            try:
+                policy, stats = next(search)
+            except StopIteration as stop:
+                if stop.value is not None:
+                    record["status"] = stop.value
+                break
+            frontier.append([stats["best"], stats["worst"]])
+    except JobTimeout:
+        record["status"] = "time"
+    except MemoryError:
+        record["status"] = "memory"
+    except SystemExit:
+        # boand_star exits on invalid options (after printing why)
+        record["status"] = "error: invalid options"
+    except Exception as e:
+        record["status"] = "error: {}".format(e)
+    finally:
+        if time_limit is not None:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous_handler)
+        if search is not None:
+            # Runs the clean up of an interrupted search
+            search.close()
+        if memory_limit is not None:
+            resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+    record["wall_time"] = time.time() - start
+
+    # Last row of the .stats file: the final one if the search completed
+    stats_file = Path(solution_folder) / (pname + ".stats")
+    rows = stats_file.read_text().splitlines() if stats_file.exists() else []
+    record["frontier"] = frontier
+    record["stats"] = dict()
+    if rows:
+        record["stats"] = dict(zip(STATS_KEYS, [float(value) for value in rows[-1].split(";")]))
+    record["timings"] = read_timings(Path(solution_folder) / (pname + ".timings"))
+    return record
+
+
+def get_jobs(solution_folder, configs, domain_file=None, problem_files=(), jobs_file=None):
+    # Jobs of the problems of a domain under each configuration, or read
+    # from a JSONL file: one job per line, with "domain", "problem" and
+    # optionally "config", "options" (boand_star arguments), "output",
+    # "time_limit" and "memory_limit"
+    jobs = []
+    if jobs_file is not None:
+        with open(jobs_file) as f:
+            for line in f:
+                if line.strip():
+                    jobs.append(json.loads(line))
+    else:
+        for config in configs:
+            for problem_file in problem_files:
+                jobs.append({"domain": domain_file, "problem": problem_file, "config": config})
+
+    for job in jobs:
+        config = job.get("config", configs[0])
+        job["config"] = config
+        if "output" not in job:
+            domain_name = Path(job["domain"]).resolve().parent.name
+            job["output"] = str(Path(solution_folder) / config / domain_name / Path(job["problem"]).stem)
+    return jobs
+
+def run_job(job):
+    options = parse_config(job["config"])
+    options.update(job.get("options", dict()))
+    record = solve(job["domain"], job["problem"], job["output"], options, job.get("time_limit"), job.get("memory_limit"))
+    # The config and options the job ran with, the job options included
+    record["config"] = format_config(options)
+    record["options"] = options
+    return record
+
+def run_jobs(jobs):
+    return [run_job(job) for job in jobs]
+
+def run_batch(jobs, solution_folder, workers=1, task_cache_dir=None, time_limit=None, memory_limit=None):
+    # Solves the jobs in this process, or in a pool of workers forked after
+    # the imports and domain determinizations: workers keep them (and the
+    # determinizations of the domains they meet) from job to job. Each
+    # problem is grounded once: the jobs of a problem go to the same worker,
+    # one after the other, reusing the task it grounded for the first one.
+    # Grounded tasks also go to the task cache (by default in the solution
+    # folder), for later batches. Records are appended to batch.jsonl as
+    # the problems finish.
+    if task_cache_dir is None:
+        task_cache_dir = str(Path(solution_folder) / "task_cache")
+    groups = dict()
+    for job in jobs:
+        groups.setdefault((job["domain"], job["problem"]), []).append(job)
+        job.setdefault("time_limit", time_limit)
+        job.setdefault("memory_limit", memory_limit)
+        job.setdefault("options", dict()).setdefault("task_cache_dir", task_cache_dir)
+    groups = [groups[key] for key in sorted(groups)]
+    if workers > 1:
+        # Pool workers are daemonic and cannot fork the heuristic pool of
+        # a job: its heuristics are evaluated in the worker itself
+        parallel_jobs = [job for job in jobs if job["options"].get("processes", 1) > 1]
+        for job in parallel_jobs:
+            job["options"]["processes"] = 1
+        if parallel_jobs:
+            print("{} job(s) run with processes = 1: heuristics are not evaluated in parallel with -w > 1".format(len(parallel_jobs)))
+    for domain_file in sorted(set(job["domain"] for job in jobs)):
+        warm_up(domain_file)
+
+    Path(solution_folder).mkdir(parents=True, exist_ok=True)
+    records = []
+    with open(Path(solution_folder) / "batch.jsonl", "a") as out:
+        if workers > 1:
+            pool = multiprocessing.get_context("fork").Pool(workers)
+            results = pool.imap_unordered(run_jobs, groups)
+        else:
+            pool = None
+            results = map(run_jobs, groups)
+        try:
+            for record in (record for group_records in results for record in group_records):
+                print("{:45} {:50} {:10} {:8.2f}s".format(record["config"], record["problem"], record["status"], record["wall_time"]), flush=True)
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                records.append(record)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+    return records
+
+
+def main(argv):
+    # Example call: python planner/batch.py <solution_folder> <domain> <problem> [<problem> ...] -c <config,...> -w <workers>
+    #           or: python planner/batch.py <solution_folder> -jobs <jobs.jsonl> -w <workers>
+
+    solution_folder = argv[1]
+    positional = []
+    for arg in argv[2:]:
+        if arg.startswith("-"):
+            break
+        positional.append(arg)
+
+    configs = ["bw_hmax_MinSum_MaxSum_Delta_bounds"]
+    if "-c" in argv:
+        index = argv.index("-c")
+        configs = argv[index+1].split(",")
+    jobs_file = None
+    if "-jobs" in argv:
+        index = argv.index("-jobs")
+        jobs_file = argv[index+1]
+    workers = 1
+    if "-w" in argv:
+        index = argv.index("-w")
+        workers = int(argv[index+1])
+    time_limit = None
+    if "-tl" in argv:
+        index = argv.index("-tl")
+        time_limit = float(argv[index+1])
+    memory_limit = None
+    if "-ml" in argv:
+        index = argv.index("-ml")
+        memory_limit = float(argv[index+1])
+    task_cache_dir = None
+    if "-gc" in argv:
+        index = argv.index("-gc")
+        task_cache_dir = argv[index+1]
+
+    if jobs_file is None and len(positional) < 2:
+        print("give a domain and its problems, or a JSONL file of jobs with -jobs")
+        exit()
+    for config in configs:
+        try:
+            parse_config(config)
+        except ValueError:
+            print("config must be named metric_heuristic_best_worst_size_selector, e.g. bw_hmax_MinSum_MaxSum_Delta_bounds")
+            exit()
+
+    jobs = get_jobs(solution_folder, configs, positional[0] if positional else None, positional[1:], jobs_file)
+    run_batch(jobs, solution_folder, workers, task_cache_dir, time_limit, memory_limit)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,271 @@
+import csv
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+from pathlib import Path
+
+from batch import solve, parse_config, STATS_KEYS
+
+BENCHMARKS_PATH = Path(__file__).resolve().parent.parent / "benchmarks"
+
+# Configurations are named like the result folders of experiments.py:
+# metric_heuristic_best_worst_size_selector
+DEFAULT_CONFIGS = [
+    "bw_hmax_MinSum_MaxSum_Delta_bounds",
+    "wb_hmax_SumMin_MaxSum_Delta_largestg",
+]
+
+# Small instances of several domains, solved in seconds by the default configs
+DEFAULT_INSTANCES = [
+    "beam-walk/p1",
+    "blocksworld-ex/p01",
+    "doors/p1",
+    "frozenlake/motivating",
+    "islands/p1",
+    "mod_first_responders/p_2_2",
+    "st_tires/p02",
+    "tireworld-truck/p1",
+]
+
+# Relative change of a metric flagged as a regression
+DEFAULT_TOLERANCE = 0.1
+
+# Smaller changes are noise whatever the tolerance: seconds of wall time
+# (the best of 3 runs of a same instance moves by up to 0.85s between
+# benchmarks on a busy single core) and MB of peak RSS. Expansions/s are
+# only compared between searches of at least MIN_SEARCH_TIME seconds.
+MIN_TIME_DIFFERENCE = 1
+MIN_RSS_DIFFERENCE = 2
+MIN_SEARCH_TIME = 1
+
+# Runs of each config and instance: the fastest one is compared
+DEFAULT_REPEATS = 3
+
+# Seconds per run: the wb configuration does not prove its frontier
+# complete on some of the default instances
+DEFAULT_TIME_LIMIT = 60
+
+
+def get_instances(specs):
+    # "domain/problem" for one instance, "domain" for all of its problems
+    instances = []
+    for spec in specs:
+        if "/" in spec:
+            instances.append(spec)
+        else:
+            for problem in sorted((BENCHMARKS_PATH / spec).glob("*.pddl")):
+                if problem.stem != "domain":
+                    instances.append("{}/{}".format(spec, problem.stem))
+    return instances
+
+
+def run_job(job):
+    # Runs in a fresh worker process pinned to a free CPU, so peak RSS and
+    # time belong to this job only. memory_limit (MB) bounds what the run
+    # allocates on top of the worker, as in batch
+    config, instance, output_folder, time_limit, memory_limit, cpus = job
+    cpu = cpus.get()
+    try:
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, {cpu})
+
+        domain, problem = instance.split("/")
+        solution_folder = Path(output_folder) / "runs" / config / domain / problem
+        record = solve(str(BENCHMARKS_PATH / domain / "domain.pddl"), str(BENCHMARKS_PATH / domain / (problem + ".pddl")),
+                       str(solution_folder), parse_config(config), time_limit, memory_limit)
+        record.update({"config": config, "instance": instance, "cpu": cpu})
+        record["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+        search_time = record["stats"].get("time", 0)
+        record["expansions_per_second"] = record["stats"].get("expansions", 0) / search_time if search_time > 0 else None
+        return record
+    finally:
+        cpus.put(cpu)
+
+
+def merge_repeats(records):
+    # One record per config and instance: the outcome of its first run,
+    # with the shortest wall time, the most expansions/s and the smallest
+    # peak RSS of its runs (noise only makes a run slower or larger)
+    merged = dict()
+    for record in records:
+        key = (record["config"], record["instance"])
+        if key not in merged:
+            merged[key] = dict(record, wall_times=[])
+        first = merged[key]
+        first["wall_times"].append(record["wall_time"])
+        first["wall_time"] = min(first["wall_time"], record["wall_time"])
+        first["peak_rss_mb"] = min(first["peak_rss_mb"], record["peak_rss_mb"])
+        if record["expansions_per_second"] is not None:
+            first["expansions_per_second"] = max(first["expansions_per_second"] or 0, record["expansions_per_second"])
+            first["stats"]["time"] = min(first["stats"]["time"], record["stats"]["time"])
+    return list(merged.values())
+
+def run_benchmark(configs, instances, output_folder, processes=1, time_limit=None, memory_limit=None, repeats=1):
+    Path(output_folder).mkdir(parents=True, exist_ok=True)
+
+    available_cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count()))
+    processes = min(processes, len(available_cpus))
+
+    # One process per job (maxtasksperchild=1) for clean RSS measurements
+    context = multiprocessing.get_context("fork")
+    manager = context.Manager()
+    cpus = manager.Queue()
+    for cpu in available_cpus[:processes]:
+        cpus.put(cpu)
+    # Repeats go round the whole set, so a slow spell of the machine does
+    # not hit every run of the same instances
+    jobs = [(config, instance, output_folder, time_limit, memory_limit, cpus) for _ in range(repeats)
+            for config in configs for instance in instances]
+    with context.Pool(processes, maxtasksperchild=1) as pool:
+        records = []
+        for record in pool.imap(run_job, jobs):
+            print("{:45} {:35} {:10} {:8.2f}s".format(record["config"], record["instance"], record["status"], record["wall_time"]), flush=True)
+            records.append(record)
+    manager.shutdown()
+
+    return {"metadata": get_metadata(processes, time_limit, memory_limit, repeats), "records": merge_repeats(records)}
+
+def get_metadata(processes, time_limit, memory_limit, repeats):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=BENCHMARKS_PATH.parent,
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "machine": platform.node(),
+        "hash_seed": os.environ.get("PYTHONHASHSEED"),
+        "processes": processes,
+        "repeats": repeats,
+        "time_limit": time_limit,
+        "memory_limit": memory_limit}
+
+
+def write_results(results, output_folder):
+    with open(Path(output_folder) / "results.json", "w") as out:
+        json.dump(results, out, indent=1)
+
+    with open(Path(output_folder) / "results.csv", "w", newline="") as out:
+        writer = csv.writer(out)
+        stages = sorted(set(stage for record in results["records"] for stage in record["timings"]))
+        writer.writerow(["config", "instance", "status", "wall_time", "peak_rss_mb", "expansions_per_second", "frontier"]
+                        + STATS_KEYS + ["timing_" + stage for stage in stages])
+        for record in results["records"]:
+            writer.writerow([record["config"], record["instance"], record["status"], record["wall_time"],
+                             record["peak_rss_mb"], record["expansions_per_second"],
+                             " ".join("{}/{}".format(best, worst) for best, worst in record["frontier"])]
+                            + [record["stats"].get(key, "") for key in STATS_KEYS]
+                            + [record["timings"].get(stage, "") for stage in stages])
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE, time_floor=MIN_TIME_DIFFERENCE):
+    # Regressions of the runs against the baseline runs of the same
+    # config and instance: slower wall time, fewer expansions per second,
+    # more peak memory, or a different outcome (status or frontier).
+    # Metrics are flagged beyond the tolerance and the noise floors.
+    regressions = []
+    baseline_records = {(record["config"], record["instance"]): record for record in baseline["records"]}
+    for record in results["records"]:
+        old = baseline_records.get((record["config"], record["instance"]), None)
+        if old is None:
+            continue
+        name = "{} {}".format(record["config"], record["instance"])
+        if record["status"] != old["status"]:
+            regressions.append("{}: status {} (was {})".format(name, record["status"], old["status"]))
+        elif record["status"] == "complete" and record["frontier"] != old["frontier"]:
+            regressions.append("{}: frontier {} (was {})".format(name, record["frontier"], old["frontier"]))
+        if record["wall_time"] - old["wall_time"] > max(old["wall_time"] * tolerance, time_floor):
+            regressions.append("{}: wall time {:.2f}s (was {:.2f}s)".format(name, record["wall_time"], old["wall_time"]))
+        if record["expansions_per_second"] is not None and old["expansions_per_second"] is not None \
+                and min(record["stats"]["time"], old["stats"]["time"]) >= MIN_SEARCH_TIME:
+            if record["expansions_per_second"] < old["expansions_per_second"] * (1 - tolerance):
+                regressions.append("{}: {:.0f} expansions/s (was {:.0f})".format(name, record["expansions_per_second"], old["expansions_per_second"]))
+        if record["peak_rss_mb"] - old["peak_rss_mb"] > max(old["peak_rss_mb"] * tolerance, MIN_RSS_DIFFERENCE):
+            regressions.append("{}: peak RSS {:.0f} MB (was {:.0f} MB)".format(name, record["peak_rss_mb"], old["peak_rss_mb"]))
+    return regressions
+
+
+def main(argv):
+    # Example call: python planner/benchmark.py <output_folder> -c <config,...> -i <domain[/problem],...> -p <processes> -b <baseline.json>
+
+    # String hashing is randomized per process: fix the seed so that runs
+    # are reproducible (set before the interpreter starts, hence the exec)
+    if os.environ.get("PYTHONHASHSEED") != "0":
+        os.environ["PYTHONHASHSEED"] = "0"
+        os.execv(sys.executable, [sys.executable] + argv)
+
+    output_folder = argv[1]
+
+    configs = DEFAULT_CONFIGS
+    if "-c" in argv:
+        index = argv.index("-c")
+        configs = argv[index+1].split(",")
+    instances = DEFAULT_INSTANCES
+    if "-i" in argv:
+        index = argv.index("-i")
+        instances = get_instances(argv[index+1].split(","))
+    processes = 1
+    if "-p" in argv:
+        index = argv.index("-p")
+        processes = int(argv[index+1])
+    time_limit = DEFAULT_TIME_LIMIT
+    if "-tl" in argv:
+        index = argv.index("-tl")
+        time_limit = float(argv[index+1])
+    memory_limit = None
+    if "-ml" in argv:
+        index = argv.index("-ml")
+        memory_limit = float(argv[index+1])
+    baseline_file = None
+    if "-b" in argv:
+        index = argv.index("-b")
+        baseline_file = argv[index+1]
+    tolerance = DEFAULT_TOLERANCE
+    if "-t" in argv:
+        index = argv.index("-t")
+        tolerance = float(argv[index+1])
+    time_floor = MIN_TIME_DIFFERENCE
+    if "-ft" in argv:
+        index = argv.index("-ft")
+        time_floor = float(argv[index+1])
+    repeats = DEFAULT_REPEATS
+    if "-r" in argv:
+        index = argv.index("-r")
+        repeats = int(argv[index+1])
+
+    for config in configs:
+        try:
+            parse_config(config)
+        except ValueError:
+            print("config must be named metric_heuristic_best_worst_size_selector, e.g. " + DEFAULT_CONFIGS[0])
+            exit()
+
+    if repeats < 1:
+        print("repeats must be >= 1")
+        exit()
+
+    results = run_benchmark(configs, instances, output_folder, processes, time_limit, memory_limit, repeats)
+    write_results(results, output_folder)
+
+    if baseline_file is not None:
+        with open(baseline_file) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, tolerance, time_floor)
+        for regression in regressions:
+            print("REGRESSION " + regression)
+        if regressions:
+            sys.exit(1)
+        print("No regressions against {}".format(baseline_file))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,114 @@
+from collections import OrderedDict
+
+from pyperplan.search.searchspace import SearchNode
+
+
+class LRUCache:
+    # Bounded key-value store with least-recently-used eviction.
+    # max_size=None keeps every entry (no eviction bookkeeping at all)
+    def __init__(self, max_size=None):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key, compute):
+        value = self.entries.get(key, None)
+        if value is not None:
+            self.hits += 1
+            if self.max_size is not None:
+                self.entries.move_to_end(key)
+            return value
+
+        self.misses += 1
+        value = compute(key)
+        self.store(key, value)
+        return value
+
+    def store(self, key, value):
+        self.entries[key] = value
+        if self.max_size is not None and len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class HeuristicCache(LRUCache):
+    # Drop-in replacement for a pyperplan heuristic: it is called with a
+    # SearchNode and memoizes the value of node.state, so that every
+    # FondHeuristic and StateSelector sharing it evaluates each state once.
+    # decode maps the search states (StateSpace ids) back to sets of facts,
+    # unless the heuristic evaluates batches of ids itself (evaluate_batch).
+    def __init__(self, heuristic, max_size=None, decode=None):
+        super().__init__(max_size)
+        self.heuristic = heuristic
+        self.decode = decode
+        self.evaluate_batch = getattr(heuristic, "evaluate_batch", None)
+
+    def __call__(self, node):
+        return self.lookup(node.state, self.evaluate)
+
+    def values(self, states):
+        # h-values of states (without duplicates), the uncached ones being
+        # evaluated in a single batch when the heuristic supports it
+        if self.evaluate_batch is None:
+            return [self.lookup(state, self.evaluate) for state in states]
+        values = [self.entries.get(state, None) for state in states]
+        missing = [state for state, value in zip(states, values) if value is None]
+        if self.max_size is not None:
+            for state, value in zip(states, values):
+                if value is not None:
+                    self.entries.move_to_end(state)
+        if not missing:
+            self.hits += len(values)
+            return values
+        computed = dict(zip(missing, self.evaluate_batch(missing)))
+        for state, value in computed.items():
+            self.store(state, value)
+        self.hits += len(values) - len(missing)
+        self.misses += len(missing)
+        return [computed[state] if value is None else value for state, value in zip(states, values)]
+
+    def evaluate(self, state):
+        if self.evaluate_batch is not None:
+            return self.evaluate_batch([state])[0]
+        if self.decode is not None:
+            state = self.decode(state)
+        return self.heuristic(SearchNode(state, None, None, 0))
+
+    def prefetch(self, states, evaluate_batch):
+        # Fill the cache with the values of the uncached states, computed
+        # all at once by evaluate_batch (e.g. HeuristicPool.evaluate).
+        # Batches of a single state are not worth the round trip.
+        missing = [state for state in dict.fromkeys(states) if state not in self.entries]
+        if len(missing) < 2:
+            return
+        self.misses += len(missing)
+        for state, value in zip(missing, evaluate_batch(missing)):
+            self.store(state, value)
+
+
+class TransitionTable(LRUCache):
+    # Successor states of (state, nondet action) pairs, shared by every policy.
+    # The transition function never changes, so entries are only dropped to
+    # respect max_size. Keys pack the pair into a single int.
+    def __init__(self, n_actions, max_size=None):
+        super().__init__(max_size)
+        self.n_actions = n_actions
+
+    def successors(self, state, nondet_action, det_actions):
+        key = state * self.n_actions + nondet_action.id
+        successors = self.entries.get(key, None)
+        if successors is not None:
+            self.hits += 1
+            if self.max_size is not None:
+                self.entries.move_to_end(key)
+            return successors
+
+        self.misses += 1
+        successors = frozenset(op.apply(state) for op in det_actions)
+        self.entries[key] = successors
+        if self.max_size is not None and len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        return successors
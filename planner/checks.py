@@ -0,0 +1,344 @@
+import random
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+from pyperplan.heuristics.relaxation import hMaxHeuristic, hAddHeuristic
+from pyperplan.search.searchspace import SearchNode
+
+import planner
+from planner import boand_star, update_g_values, update_g_brute
+from policy import Policy, CYCLE_COST
+from preprocessing import get_grounded_task
+from relaxation import BatchRelaxationHeuristic
+from states import StateSpace
+
+# Cross-checks of the fast paths of the search against the slow code they
+# replace: each one runs the fast and the reference computation side by
+# side and reports where they differ
+BENCHMARKS_PATH = Path(__file__).resolve().parent.parent / "benchmarks"
+
+# Small instances of several domains: the brute force g update enumerates
+# every pi-trajectory of every child
+DEFAULT_INSTANCES = [
+    "beam-walk/p1",
+    "blocksworld-ex/p01",
+    "doors/p1",
+    "frozenlake/motivating",
+    "islands/p1",
+    "mod_first_responders/p_2_2",
+    "tireworld-truck/p1",
+]
+
+# Expansions per search: the brute force g update is exponential in the
+# size of the policies, the checks stop the searches early
+DEFAULT_EXPANSIONS = 2000
+
+# Failures printed per check and instance, the others are only counted
+MAX_REPORTED = 5
+
+
+def get_files(instance):
+    domain, problem = instance.split("/")
+    return str(BENCHMARKS_PATH / domain / "domain.pddl"), str(BENCHMARKS_PATH / domain / (problem + ".pddl"))
+
+def solve(instance, output_folder, options):
+    domain_file, problem_file = get_files(instance)
+    for _ in boand_star(domain_file, problem_file, output_folder, **options):
+        pass
+
+
+def get_g_values(policy, task):
+    # g-values by their definition, from the policy graph: best_g is the
+    # shortest pi-distance from the initial state, worst_g the longest one,
+    # or CYCLE_COST for the states reachable from a cycle
+    best_g = {task.initial_state: 0}
+    frontier = [task.initial_state]
+    for state in frontier:
+        for succ in policy.successors(state):
+            if succ not in best_g:
+                best_g[succ] = best_g[state] + 1
+                frontier.append(succ)
+    worst_g = dict()
+    # Components come sinks first: sources first once reversed
+    for component in reversed(policy.components(task)):
+        for state in component:
+            if len(component) > 1 or state in policy.successors(state):
+                worst_g[state] = CYCLE_COST
+            else:
+                worst_g.setdefault(state, 0)
+            for succ in policy.successors(state):
+                if succ not in component:
+                    if worst_g[state] == CYCLE_COST:
+                        worst_g[succ] = CYCLE_COST
+                    elif worst_g.get(succ, 0) != CYCLE_COST:
+                        worst_g[succ] = max(worst_g.get(succ, 0), worst_g[state] + 1)
+    return best_g, worst_g
+
+def check_g_update(instance, output_folder, options):
+    # Incremental g update (-g incremental) and the re-enumeration of the
+    # pi-trajectories (-g brute) against the definitions of the g-values,
+    # on every child generated by the search
+    checked, failures = 0, []
+    incremental = planner.update_g_incremental
+
+    def update_g(policy, state, reached_states, task):
+        nonlocal checked
+        reference = policy.copy()
+        changed = incremental(policy, state, reached_states, task)
+        update_g_values(reference, state, reached_states, task)
+        update_g_brute(reference, task)
+        for reached_state in list(reference.best_ancestors):
+            reference.best_g[reached_state] = reference.walk_best_g(reached_state)
+            reference.worst_g[reached_state] = reference.walk_worst_g(reached_state)
+        checked += 1
+        expected = dict(zip(["best_g", "worst_g"], get_g_values(policy, task)))
+        for engine, engine_policy in [("incremental", policy), ("brute", reference)]:
+            for name in ["best_g", "worst_g"]:
+                values = dict(getattr(engine_policy, name).items())
+                if values != expected[name]:
+                    differences = {s: (values.get(s), expected[name].get(s)) for s in values.keys() | expected[name].keys()
+                                   if values.get(s) != expected[name].get(s)}
+                    failures.append("{} {} after mapping state {}: (value, definition) {}".format(engine, name, state, differences))
+        if policy.cyclic != reference.cyclic:
+            failures.append("cyclic after mapping state {}: {} (brute: {})".format(state, policy.cyclic, reference.cyclic))
+        return changed
+
+    planner.update_g_incremental = update_g
+    try:
+        solve(instance, output_folder, options)
+    finally:
+        planner.update_g_incremental = incremental
+    return checked, failures
+
+
+def check_aggregates(instance, output_folder, options):
+    # f-values and selected states of the heaps kept by the policies
+    # against a scan of Out, with the heaps used whatever the size of Out
+    # (SCAN_SIZE = 0)
+    checked, failures = 0, []
+    scans = {
+        planner.MinSumBestCaseHeuristic: lambda self, policy, h: min(
+            [policy.get_best_g(state) + self.weight * h[state] for state in h], default=float("inf")),
+        planner.MaxSumWorstCaseHeuristic: lambda self, policy, h: max(
+            [-self.entry(policy, state, h[state])[0] for state in h], default=float("inf")),
+    }
+
+    def checked_f_value(cls, get_f_value, scan):
+        def get_checked_f_value(self, policy):
+            nonlocal checked
+            value = get_f_value(self, policy)
+            if scan is None:
+                pending = list(policy.pending)
+                expected = max(self.cp_heuristic.values(pending)) + len(pending) - 1 if pending else 0
+            else:
+                out = list(policy.pending.union(policy.goal_states))
+                expected = scan(self, policy, dict(zip(out, self.cp_heuristic.values(out))))
+                if cls is planner.MaxSumWorstCaseHeuristic and policy.cyclic and expected < CYCLE_COST:
+                    expected = float("inf")
+            checked += 1
+            if value != expected:
+                failures.append("{}: {} (scan: {})".format(cls.__name__, value, expected))
+            return value
+        return get_checked_f_value
+
+    select_pending_state = planner.IndexedStateSelector.select_pending_state
+
+    def checked_select_pending_state(self, policy, heuristic):
+        nonlocal checked
+        pending = list(policy.pending)
+        expected = min(self.entry(policy, state, h) for state, h in zip(pending, heuristic.values(pending)))[1]
+        state = select_pending_state(self, policy, heuristic)
+        checked += 1
+        if state != expected:
+            failures.append("{} selected {} (scan: {})".format(self.__class__.__name__, state, expected))
+        return state
+
+    patched = [(cls, cls.get_f_value) for cls in [planner.MinSumBestCaseHeuristic, planner.MaxSumWorstCaseHeuristic,
+                                                  planner.DeltaSizeHeuristic]]
+    scan_size = planner.SCAN_SIZE
+    for cls, get_f_value in patched:
+        cls.get_f_value = checked_f_value(cls, get_f_value, scans.get(cls, None))
+    planner.IndexedStateSelector.select_pending_state = checked_select_pending_state
+    planner.SCAN_SIZE = 0
+    try:
+        solve(instance, output_folder, options)
+    finally:
+        for cls, get_f_value in patched:
+            cls.get_f_value = get_f_value
+        planner.IndexedStateSelector.select_pending_state = select_pending_state
+        planner.SCAN_SIZE = scan_size
+    return checked, failures
+
+
+class _Outcome:
+    # Deterministic outcome of a random policy graph
+    def __init__(self, target):
+        self.target = target
+
+    def apply(self, state):
+        return self.target
+
+class _GraphTask:
+    initial_state = 0
+
+    def __init__(self, goals):
+        self.goals = goals
+
+    def goal_reached(self, state):
+        return state in self.goals
+
+def check_policy_graphs(graphs, seed=0):
+    # components, is_cyclic and is_proper against the definitions, on random
+    # policy graphs: proper iff every state reached from the initial state
+    # is a goal or mapped, and reaches a goal; cyclic iff a reached state
+    # reaches itself
+    checked, failures = 0, []
+    rng = random.Random(seed)
+    for _ in range(graphs):
+        size = rng.randint(3, 10)
+        goals = set(rng.sample(range(1, size), rng.randint(1, 2)))
+        strategy = dict()
+        for state in range(size):
+            if state not in goals and rng.random() > 0.05:
+                strategy[state] = ("a", tuple(_Outcome(rng.randrange(size)) for _ in range(rng.randint(1, 3))))
+        policy = Policy(strategy, set(), set())
+        task = _GraphTask(goals)
+
+        reached = {task.initial_state}
+        frontier = [task.initial_state]
+        while frontier:
+            for succ in policy.successors(frontier.pop()):
+                if succ not in reached:
+                    reached.add(succ)
+                    frontier.append(succ)
+        # States reaching each state (goal states are not expanded by the
+        # policy, they have no successors)
+        reaching = {state: set() for state in reached}
+        for state in reached:
+            frontier = [state]
+            while frontier:
+                for succ in policy.successors(frontier.pop()):
+                    if state not in reaching[succ]:
+                        reaching[succ].add(state)
+                        frontier.append(succ)
+        goal_reaching = set().union(*[reaching[goal] | {goal} for goal in goals if goal in reached])
+        proper = all(state in goals or state in strategy for state in reached) and goal_reaching == reached
+        cyclic = any(state in reaching[state] for state in reached)
+
+        components = policy.components(task)
+        checked += 1
+        graph = ({state: [outcome.target for outcome in action[1]] for state, action in strategy.items()}, goals)
+        if sorted(state for component in components for state in component) != sorted(reached):
+            failures.append("components {} of {}".format(components, graph))
+        for component in components:
+            if any(reaching[state] & set(component) != set(component) for state in component if len(component) > 1):
+                failures.append("component {} of {} is not strongly connected".format(component, graph))
+        if policy.is_cyclic(task) != cyclic:
+            failures.append("is_cyclic {} of {}".format(not cyclic, graph))
+        if policy.is_proper(task) != proper:
+            failures.append("is_proper {} of {}".format(not proper, graph))
+    return checked, failures
+
+
+def check_relaxation(instance, states=300, seed=0, task_cache_dir=None):
+    # Batched NumPy hmax/hadd against pyperplan's hMaxHeuristic/hAddHeuristic,
+    # on the states of a random walk
+    checked, failures = 0, []
+    domain_file, problem_file = get_files(instance)
+    grounded_task = get_grounded_task(domain_file, problem_file, task_cache_dir)
+    space = StateSpace(grounded_task)
+    rng = random.Random(seed)
+    walk = [space.initial_state]
+    for _ in range(states):
+        successors = space.get_successor_states(rng.choice(walk))
+        if successors:
+            walk.append(rng.choice(successors)[1])
+    walk = list(dict.fromkeys(walk))
+    for aggregate, heuristic in [("max", hMaxHeuristic(grounded_task)), ("sum", hAddHeuristic(grounded_task))]:
+        values = BatchRelaxationHeuristic(space, aggregate).evaluate_batch(walk)
+        for state, value in zip(walk, values):
+            expected = heuristic(SearchNode(space.decode(state), None, None, 0))
+            checked += 1
+            if value != expected:
+                failures.append("h{} of {}: {} (pyperplan: {})".format(aggregate, sorted(space.decode(state)), value, expected))
+    return checked, failures
+
+
+CHECKS = ["g", "scan", "graphs", "relaxation"]
+
+
+def main(argv):
+    # Example call: python planner/checks.py [-c g,scan,graphs,relaxation] [-i <domain/problem,...>] [-el <expansions>] [-o <output_folder>]
+    checks = CHECKS
+    if "-c" in argv:
+        index = argv.index("-c")
+        checks = argv[index+1].split(",")
+    instances = DEFAULT_INSTANCES
+    if "-i" in argv:
+        index = argv.index("-i")
+        instances = argv[index+1].split(",")
+    expansion_limit = DEFAULT_EXPANSIONS
+    if "-el" in argv:
+        index = argv.index("-el")
+        expansion_limit = int(argv[index+1])
+    # Solutions of the searches, in a temporary folder unless given
+    output_folder = None
+    if "-o" in argv:
+        index = argv.index("-o")
+        output_folder = argv[index+1]
+    task_cache_dir = None
+    if "-gc" in argv:
+        index = argv.index("-gc")
+        task_cache_dir = argv[index+1]
+
+    for check in checks:
+        if check not in CHECKS:
+            print("checks must be among " + ", ".join(CHECKS))
+            exit()
+
+    # Configurations of the searches: together they use the three heaps
+    # (MinSum, MaxSum, Delta) and the three indexed selectors
+    options = [
+        {"use_metric": "bw", "use_selector": "bounds"},
+        {"use_metric": "wb", "use_selector": "largestg"},
+        {"use_metric": "b", "use_selector": "best", "use_worst_case_heuristic": "Blind"},
+    ]
+    for config in options:
+        config.update({"task_cache_dir": task_cache_dir, "expansion_limit": expansion_limit})
+    temporary_folder = None
+    if output_folder is None:
+        output_folder = temporary_folder = tempfile.mkdtemp(prefix="checks_")
+    runs = []
+    for check in checks:
+        if check == "graphs":
+            runs.append((check, "random graphs", lambda: check_policy_graphs(20000)))
+        elif check == "relaxation":
+            for instance in instances:
+                runs.append((check, instance, lambda instance=instance: check_relaxation(instance, task_cache_dir=task_cache_dir)))
+        else:
+            function = check_g_update if check == "g" else check_aggregates
+            for instance in instances:
+                for config in options:
+                    folder = str(Path(output_folder) / check / config["use_metric"] / instance)
+                    runs.append((check, "{} ({})".format(instance, config["use_metric"]),
+                                 lambda function=function, instance=instance, folder=folder, config=config: function(instance, folder, config)))
+
+    failed = 0
+    try:
+        for check, name, run in runs:
+            checked, failures = run()
+            print("{:12} {:45} {:8} checked {}".format(check, name, checked, "FAILED {}".format(len(failures)) if failures else "OK"), flush=True)
+            for failure in failures[:MAX_REPORTED]:
+                print("    " + failure)
+            failed += len(failures)
+    finally:
+        if temporary_folder is not None:
+            shutil.rmtree(temporary_folder, ignore_errors=True)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,64 @@
+import resource
+import time
+
+
+class PhaseTimers:
+    # Cumulative seconds and number of calls of the phases of the search.
+    # A phase is timed by wrapping the function that implements it, so
+    # nothing is timed (nor slowed down) unless the wrappers are installed.
+    # Nested phases are timed on their own: extend includes update_g.
+    def __init__(self):
+        self.seconds = dict()
+        self.calls = dict()
+
+    def wrap(self, phase, function):
+        self.seconds.setdefault(phase, 0.0)
+        self.calls.setdefault(phase, 0)
+        seconds = self.seconds
+        calls = self.calls
+        clock = time.perf_counter
+
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                seconds[phase] += clock() - start
+                calls[phase] += 1
+
+        return timed
+
+    def write(self, path):
+        with open(path, "w") as out:
+            for phase in self.seconds:
+                out.write("{};{};{}\n".format(phase, self.calls[phase], self.seconds[phase]))
+
+
+class ProgressLog:
+    # Snapshot of the search written every interval seconds: elapsed time,
+    # iterations, expansions, expansions/s (since the previous snapshot),
+    # open list size, solutions and peak memory (MB)
+    def __init__(self, path, interval):
+        self.path = path
+        self.interval = interval
+        self.start = time.time()
+        self.next_time = self.start + interval
+        self.last_time = self.start
+        self.last_expansions = 0
+        with open(self.path, "w") as out:
+            out.write("time;iterations;expansions;expansions_per_second;open;solutions;memory\n")
+
+    def update(self, iterations, expansions, open_size, solutions):
+        now = time.time()
+        if now >= self.next_time:
+            self.write(now, iterations, expansions, open_size, solutions)
+            self.next_time = now + self.interval
+
+    def write(self, now, iterations, expansions, open_size, solutions):
+        rate = (expansions - self.last_expansions) / max(now - self.last_time, 1e-9)
+        memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        with open(self.path, "a") as out:
+            out.write("{:.2f};{};{};{:.1f};{};{};{:.1f}\n".format(
+                now - self.start, iterations, expansions, rate, open_size, solutions, memory))
+        self.last_time = now
+        self.last_expansions = expansions
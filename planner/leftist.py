@@ -0,0 +1,27 @@
+# Persistent leftist heaps (min-heaps): a heap is None or a tuple
+# (rank, key, left, right) that is never modified, so a policy and its
+# children share their heaps and each insertion only creates O(log n) new
+# nodes. Used for the f-value aggregates of the policies.
+
+
+def merge(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    if b[1] < a[1]:
+        a, b = b, a
+    right = merge(a[3], b)
+    left = a[2]
+    if left is None or left[0] < right[0]:
+        left, right = right, left
+    return (1 if right is None else right[0] + 1, a[1], left, right)
+
+def insert(heap, key):
+    return merge(heap, (1, key, None, None))
+
+def top(heap):
+    return heap[1]
+
+def pop(heap):
+    return merge(heap[2], heap[3])
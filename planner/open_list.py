@@ -0,0 +1,271 @@
+import heapq
+import os
+import pickle
+import shutil
+import tempfile
+from collections import deque
+
+
+class BucketOpenList:
+    # Open list of policies keyed by f-value tuples. Entries with the same
+    # key share a bucket (deque) and the heap only holds the distinct keys,
+    # so push/pop are O(1) plus a heap operation when a key appears or runs
+    # out. f-values are small integers: there are few distinct keys even on
+    # large frontiers. Ties are broken FIFO (first pushed, first popped) or
+    # LIFO, never by comparing policies.
+    def __init__(self, ties="lifo"):
+        if ties not in ["fifo", "lifo"]:
+            raise ValueError("ties must be 'fifo' or 'lifo'")
+        self.lifo = ties == "lifo"
+        self.buckets = dict()
+        self.keys = []
+        self.size = 0
+
+    def push(self, key, item):
+        bucket = self.buckets.get(key, None)
+        if bucket is None:
+            bucket = deque()
+            self.buckets[key] = bucket
+            heapq.heappush(self.keys, key)
+        bucket.append(item)
+        self.size += 1
+
+    def pop(self):
+        key = self.keys[0]
+        bucket = self.buckets[key]
+        item = bucket.pop() if self.lifo else bucket.popleft()
+        if not bucket:
+            heapq.heappop(self.keys)
+            del self.buckets[key]
+        self.size -= 1
+        return key, item
+
+    def discard(self, dominated, keep=None):
+        # Drop the entries whose key is dominated, except those for which
+        # keep(item) holds. Returns the number of entries dropped.
+        dropped = 0
+        for key in [key for key in self.buckets if dominated(key)]:
+            bucket = self.buckets[key]
+            if keep is None:
+                remaining = deque()
+            else:
+                remaining = deque(item for item in bucket if keep(item))
+            dropped += len(bucket) - len(remaining)
+            if remaining:
+                self.buckets[key] = remaining
+            else:
+                del self.buckets[key]
+        if dropped:
+            self.keys = list(self.buckets)
+            heapq.heapify(self.keys)
+            self.size -= dropped
+        return dropped
+
+    def min_key(self):
+        return self.keys[0]
+
+    def __len__(self):
+        return self.size
+
+    def __bool__(self):
+        return self.size > 0
+
+    def close(self):
+        pass
+
+
+class _Segment:
+    # Entries of a bucket written to disk, in push order, and the ids of the
+    # interned objects they refer to
+    __slots__ = ("path", "size", "interned")
+
+    def __init__(self, path, size, interned):
+        self.path = path
+        self.size = size
+        self.interned = interned
+
+
+class SpillingOpenList(BucketOpenList):
+    # BucketOpenList keeping at most max_resident entries in memory. A bucket
+    # is a sequence of chunks in push order, each one a deque or a _Segment
+    # on disk. When there are too many resident entries, those that would
+    # be popped last (worst keys first, then the far end of their bucket)
+    # are pickled to spill_dir until half of max_resident are left. A segment
+    # is loaded back when the pop reaches it, so the entries come out in the
+    # same order as from a BucketOpenList: the search is the same, only
+    # slower. Objects in shared (e.g. the TransitionTable referenced by the
+    # policies) are pickled by reference. So are the instances of the
+    # interned types (e.g. the frozen layers of the persistent containers,
+    # shared by a policy and its siblings): they stay in memory, once, while
+    # a segment refers to them, so only what is local to each entry is
+    # written and loaded entries share them again.
+    def __init__(self, max_resident, ties="lifo", spill_dir=None, shared=(), interned=()):
+        super().__init__(ties)
+        if max_resident < 1:
+            raise ValueError("max_resident must be >= 1")
+        self.max_resident = max_resident
+        self.resident = 0
+        self.spilled = 0
+        if spill_dir is not None:
+            os.makedirs(spill_dir, exist_ok=True)
+        self.spill_dir = tempfile.mkdtemp(prefix="open_list_", dir=spill_dir)
+        self.segments = 0
+        self.shared = list(shared)
+        self.shared_ids = {id(obj): i for i, obj in enumerate(self.shared)}
+        self.interned_types = tuple(interned)
+        # Interned objects by id: [object, number of segments referring to it]
+        self.interned = dict()
+        self.segment_interned = None
+
+    def push(self, key, item):
+        chunks = self.buckets.get(key, None)
+        if chunks is None:
+            chunks = deque()
+            self.buckets[key] = chunks
+            heapq.heappush(self.keys, key)
+        if not chunks or not isinstance(chunks[-1], deque):
+            chunks.append(deque())
+        chunks[-1].append(item)
+        self.size += 1
+        self.resident += 1
+        if self.resident > self.max_resident:
+            self.spill()
+
+    def pop(self):
+        key = self.keys[0]
+        chunks = self.buckets[key]
+        if self.lifo:
+            chunk = chunks[-1]
+            if not isinstance(chunk, deque):
+                chunk = chunks[-1] = self.load(chunk)
+            item = chunk.pop()
+            if not chunk:
+                chunks.pop()
+        else:
+            chunk = chunks[0]
+            if not isinstance(chunk, deque):
+                chunk = chunks[0] = self.load(chunk)
+            item = chunk.popleft()
+            if not chunk:
+                chunks.popleft()
+        if not chunks:
+            heapq.heappop(self.keys)
+            del self.buckets[key]
+        self.size -= 1
+        self.resident -= 1
+        if self.resident > self.max_resident:
+            self.spill()
+        return key, item
+
+    def discard(self, dominated, keep=None):
+        dropped = 0
+        for key in [key for key in self.buckets if dominated(key)]:
+            remaining = deque()
+            for chunk in self.buckets[key]:
+                if not isinstance(chunk, deque):
+                    if keep is None:
+                        os.remove(chunk.path)
+                        self.release(chunk)
+                        dropped += chunk.size
+                        continue
+                    chunk = self.load(chunk)
+                kept = deque() if keep is None else deque(item for item in chunk if keep(item))
+                dropped += len(chunk) - len(kept)
+                self.resident -= len(chunk) - len(kept)
+                if kept:
+                    remaining.append(kept)
+            if remaining:
+                self.buckets[key] = remaining
+            else:
+                del self.buckets[key]
+        if dropped:
+            self.keys = list(self.buckets)
+            heapq.heapify(self.keys)
+            self.size -= dropped
+        if self.resident > self.max_resident:
+            self.spill()
+        return dropped
+
+    def spill(self):
+        excess = self.resident - self.max_resident // 2
+        min_key = self.keys[0]
+        for key in sorted(self.buckets, reverse=True):
+            if excess <= 0:
+                break
+            # Chunks from the one popped last to the one popped first
+            chunks = self.buckets[key]
+            order = list(chunks) if self.lifo else list(reversed(chunks))
+            result = []
+            for i, chunk in enumerate(order):
+                if excess > 0 and isinstance(chunk, deque):
+                    count = len(chunk)
+                    if key == min_key and i == len(order) - 1:
+                        # The next entry popped stays in memory
+                        count -= 1
+                    count = min(count, excess)
+                    if count > 0:
+                        if self.lifo:
+                            items = [chunk.popleft() for _ in range(count)]
+                        else:
+                            items = [chunk.pop() for _ in range(count)][::-1]
+                        result.append(self.store(items))
+                        excess -= count
+                if not isinstance(chunk, deque) or chunk:
+                    result.append(chunk)
+            self.buckets[key] = deque(result) if self.lifo else deque(reversed(result))
+
+    def store(self, items):
+        path = os.path.join(self.spill_dir, "{}.segment".format(self.segments))
+        self.segments += 1
+        self.segment_interned = set()
+        with open(path, "wb") as f:
+            pickler = pickle.Pickler(f, pickle.HIGHEST_PROTOCOL)
+            pickler.persistent_id = self.persistent_id
+            pickler.dump(items)
+        for key in self.segment_interned:
+            self.interned[key][1] += 1
+        segment = _Segment(path, len(items), self.segment_interned)
+        self.segment_interned = None
+        self.resident -= len(items)
+        self.spilled += len(items)
+        return segment
+
+    def load(self, segment):
+        with open(segment.path, "rb") as f:
+            unpickler = pickle.Unpickler(f)
+            unpickler.persistent_load = self.persistent_load
+            items = unpickler.load()
+        os.remove(segment.path)
+        self.release(segment)
+        self.resident += len(items)
+        return deque(items)
+
+    def release(self, segment):
+        # Interned objects are dropped with the last segment referring to them
+        for key in segment.interned:
+            cell = self.interned[key]
+            cell[1] -= 1
+            if not cell[1]:
+                del self.interned[key]
+
+    def persistent_id(self, obj):
+        key = id(obj)
+        if key in self.shared_ids:
+            return self.shared_ids[key]
+        if isinstance(obj, self.interned_types):
+            # Kept alive by self.interned, so the id is not reused while
+            # a segment refers to it
+            if key not in self.interned:
+                self.interned[key] = [obj, 0]
+            self.segment_interned.add(key)
+            return ("interned", key)
+        return None
+
+    def persistent_load(self, pid):
+        if isinstance(pid, tuple):
+            return self.interned[pid[1]][0]
+        return self.shared[pid]
+
+    def close(self):
+        self.interned = dict()
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
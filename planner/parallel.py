@@ -0,0 +1,59 @@
+import multiprocessing
+
+from pyperplan.search.searchspace import SearchNode
+
+# Classical heuristic of the worker process. The pool forks the planner
+# after the heuristic has been built, so each worker starts with its own
+# ready-to-use copy (no re-grounding, same hash seed as the parent).
+_heuristic = None
+_facts = None
+
+# Fewest states sent to a worker at once by batch heuristics: smaller
+# batches are evaluated faster in the parent than sent to the workers
+MIN_CHUNK_SIZE = 128
+
+
+def _init_worker(heuristic, facts):
+    global _heuristic, _facts
+    _heuristic = heuristic
+    _facts = facts
+
+def _evaluate(bits):
+    facts = []
+    while bits:
+        lowest = bits & -bits
+        facts.append(_facts[lowest.bit_length() - 1])
+        bits ^= lowest
+    return _heuristic(SearchNode(frozenset(facts), None, None, 0))
+
+def _evaluate_chunk(batch):
+    return _heuristic.evaluate_bits(batch)
+
+
+class HeuristicPool:
+    # Evaluates batches of StateSpace states on a pool of worker processes.
+    # Only the fact bitsets travel to the workers, the h-values come back
+    # in the order of the batch. Heuristics evaluating batches of bitsets
+    # (BatchRelaxationHeuristic) get one chunk of the batch per worker.
+    def __init__(self, heuristic, space, processes):
+        self.heuristic = heuristic
+        self.space = space
+        self.processes = processes
+        self.batch = hasattr(heuristic, "evaluate_bits")
+        context = multiprocessing.get_context("fork")
+        self.pool = context.Pool(processes, _init_worker, (heuristic, space.facts))
+
+    def evaluate(self, states):
+        if self.batch:
+            batch = [self.space.states[state] for state in states]
+            size = max(MIN_CHUNK_SIZE, -(-len(batch) // self.processes))
+            if len(batch) <= size:
+                return self.heuristic.evaluate_bits(batch)
+            chunks = [batch[start:start+size] for start in range(0, len(batch), size)]
+            return [value for values in self.pool.map(_evaluate_chunk, chunks) for value in values]
+        chunksize = max(1, len(states) // (4 * self.processes))
+        return self.pool.map(_evaluate, [self.space.states[state] for state in states], chunksize)
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
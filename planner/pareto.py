@@ -0,0 +1,45 @@
+from bisect import bisect_left, bisect_right
+
+
+class ParetoArchive:
+    # f-values (first two components of the open list keys) of the
+    # solutions found so far, without dominated entries. Sorted by the
+    # first component, the second one is then strictly decreasing, so the
+    # entry with the lowest second component among those with a first
+    # component <= x is the last one before x: dominance is a bisection.
+    # With epsilon > 0, dominates() tests epsilon-dominance: f-values within
+    # a factor (1 + epsilon) of a solution are dominated too.
+    def __init__(self, epsilon=0):
+        self.firsts = []
+        self.seconds = []
+        self.factor = 1 + epsilon
+
+    def dominates(self, f_value):
+        # Weak dominance, as the pruning of the search: equal f-values
+        # cannot lead to a new point of the frontier
+        if self.factor == 1:
+            return self.weakly_dominates(f_value[0], f_value[1])
+        return self.weakly_dominates(self.factor * f_value[0], self.factor * f_value[1])
+
+    def weakly_dominates(self, first, second):
+        i = bisect_right(self.firsts, first)
+        return i > 0 and self.seconds[i-1] <= second
+
+    def add(self, f_value):
+        if self.weakly_dominates(f_value[0], f_value[1]):
+            return False
+        # Entries dominated by the new one follow it, with a larger or
+        # equal first component and a larger or equal second component
+        i = bisect_left(self.firsts, f_value[0])
+        j = i
+        while j < len(self.firsts) and self.seconds[j] >= f_value[1]:
+            j += 1
+        self.firsts[i:j] = [f_value[0]]
+        self.seconds[i:j] = [f_value[1]]
+        return True
+
+    def __len__(self):
+        return len(self.firsts)
+
+    def __iter__(self):
+        return iter(zip(self.firsts, self.seconds))
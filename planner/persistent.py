@@ -0,0 +1,245 @@
+from collections.abc import MutableMapping, MutableSet
+
+# Persistent containers used by Policy. A copy does not duplicate the
+# entries: the parent's local changes are frozen into a shared layer and
+# both parent and copy keep writing into new (empty) local layers. Lookups
+# walk the chain of layers, which is flattened again into a single layer
+# once it becomes deeper than MAX_DEPTH. Containers with at most FLAT_SIZE
+# entries are cheaper to copy than to share, so they are copied as dicts.
+MAX_DEPTH = 4
+FLAT_SIZE = 32
+
+
+class _Marker:
+    # Sentinel pickled by reference, so that containers (and the layers
+    # they share) can be pickled as they are
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __reduce__(self):
+        return self.name
+
+_MISSING = _Marker("_MISSING")
+_DELETED = _Marker("_DELETED")
+
+
+class _Layer:
+    __slots__ = ("data", "parent", "depth")
+
+    def __init__(self, data, parent):
+        self.data = data
+        self.parent = parent
+        self.depth = 0 if parent is None else parent.depth + 1
+
+
+# Types of the objects shared by a container and its copies, e.g. pickled
+# by reference by the open list written to disk
+SHARED_TYPES = (_Layer,)
+
+
+def _lookup(data, parent, key):
+    value = data.get(key, _MISSING)
+    while value is _MISSING and parent is not None:
+        value = parent.data.get(key, _MISSING)
+        parent = parent.parent
+    return _MISSING if value is _DELETED else value
+
+def _items(data, parent):
+    # Live entries, the newest layer shadowing the older ones
+    if parent is None:
+        for key, value in data.items():
+            if value is not _DELETED:
+                yield key, value
+        return
+    seen = set()
+    layer_data = data
+    while True:
+        for key, value in layer_data.items():
+            if key not in seen:
+                seen.add(key)
+                if value is not _DELETED:
+                    yield key, value
+        if parent is None:
+            return
+        layer_data = parent.data
+        parent = parent.parent
+
+def _freeze(data, parent):
+    # Layer shared by a container and its copies
+    if not data:
+        return parent
+    layer = _Layer(data, parent)
+    if layer.depth >= MAX_DEPTH:
+        layer = _Layer(dict(_items(data, parent)), None)
+    return layer
+
+
+class _PersistentContainer:
+    __slots__ = ("_data", "_parent", "_len")
+
+    def __init__(self):
+        self._data = dict()
+        self._parent = None
+        self._len = 0
+
+    def _set(self, key, value):
+        old = self._data.get(key, _MISSING)
+        if old is _MISSING:
+            old = _lookup({}, self._parent, key)
+        if old is _MISSING or old is _DELETED:
+            self._len += 1
+        self._data[key] = value
+
+    def _delete(self, key):
+        if _lookup(self._data, self._parent, key) is _MISSING:
+            raise KeyError(key)
+        if self._parent is not None and _lookup({}, self._parent, key) is not _MISSING:
+            self._data[key] = _DELETED
+        else:
+            del self._data[key]
+        self._len -= 1
+
+    def _copy(self):
+        new = self.__class__.__new__(self.__class__)
+        new._len = self._len
+        if self._len <= FLAT_SIZE:
+            if self._parent is not None:
+                self._data = dict(_items(self._data, self._parent))
+                self._parent = None
+            new._data = self._data.copy()
+            new._parent = None
+            return new
+        self._parent = _freeze(self._data, self._parent)
+        self._data = dict()
+        new._data = dict()
+        new._parent = self._parent
+        return new
+
+    def __contains__(self, key):
+        # _lookup inlined: this is the hot path of the search
+        value = self._data.get(key, _MISSING)
+        parent = self._parent
+        while value is _MISSING and parent is not None:
+            value = parent.data.get(key, _MISSING)
+            parent = parent.parent
+        return value is not _MISSING and value is not _DELETED
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        for key, _ in _items(self._data, self._parent):
+            yield key
+
+
+class PersistentDict(_PersistentContainer, MutableMapping):
+    __slots__ = ()
+
+    def __init__(self, items=()):
+        super().__init__()
+        for key, value in dict(items).items():
+            self._set(key, value)
+
+    def __getitem__(self, key):
+        value = self._data.get(key, _MISSING)
+        parent = self._parent
+        while value is _MISSING and parent is not None:
+            value = parent.data.get(key, _MISSING)
+            parent = parent.parent
+        if value is _MISSING or value is _DELETED:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        value = self._data.get(key, _MISSING)
+        parent = self._parent
+        while value is _MISSING and parent is not None:
+            value = parent.data.get(key, _MISSING)
+            parent = parent.parent
+        if value is _MISSING or value is _DELETED:
+            return default
+        return value
+
+    def __setitem__(self, key, value):
+        self._set(key, value)
+
+    def __delitem__(self, key):
+        self._delete(key)
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if not isinstance(other, PersistentDict):
+            return MutableMapping.__eq__(self, other)
+        if self._len != other._len:
+            return False
+        if self._parent is other._parent:
+            # Copies of the same container only differ in their local layers
+            for key in self._data.keys() | other._data.keys():
+                if _lookup(self._data, self._parent, key) != _lookup(other._data, other._parent, key):
+                    return False
+            return True
+        return dict(self.items()) == dict(other.items())
+
+    def items(self):
+        return list(_items(self._data, self._parent))
+
+    def values(self):
+        return [value for _, value in _items(self._data, self._parent)]
+
+    def copy(self):
+        return self._copy()
+
+    def __repr__(self):
+        return "PersistentDict(%r)" % dict(self.items())
+
+
+class PersistentSet(_PersistentContainer, MutableSet):
+    __slots__ = ()
+
+    def __init__(self, elements=()):
+        super().__init__()
+        self.update(elements)
+
+    def add(self, element):
+        if element not in self:
+            self._set(element, True)
+
+    def discard(self, element):
+        if element in self:
+            self._delete(element)
+
+    def remove(self, element):
+        self._delete(element)
+
+    def update(self, *iterables):
+        for iterable in iterables:
+            for element in iterable:
+                self.add(element)
+
+    def pop(self):
+        # Oldest element first, like a FIFO over the insertion layers
+        layers = [self._data]
+        parent = self._parent
+        while parent is not None:
+            layers.append(parent.data)
+            parent = parent.parent
+        for layer_data in reversed(layers):
+            for element, value in layer_data.items():
+                if value is not _DELETED and element in self:
+                    self._delete(element)
+                    return element
+        raise KeyError("pop from an empty set")
+
+    def union(self, *iterables):
+        result = set(self)
+        result.update(*iterables)
+        return result
+
+    def copy(self):
+        return self._copy()
+
+    def __repr__(self):
+        return "PersistentSet(%r)" % set(self)
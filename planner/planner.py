@@ -1,30 +1,84 @@
 from abc import ABC, abstractmethod
+import cProfile
 import heapq
 import math
-import re
+import resource
 import time
 import sys
 
 from pathlib import Path
 
-from pddl import parse_domain, parse_problem
-
 from pyperplan.heuristics.relaxation import *
 from pyperplan.heuristics.lm_cut import LmCutHeuristic
 from pyperplan.search.searchspace import SearchNode
 
-from policy import Policy, CYCLE_COST
-from preprocessing import get_alloutcome_determinization
+from policy import Policy, CYCLE_COST, zobrist_key
+from persistent import SHARED_TYPES
+import leftist
+from cache import HeuristicCache
+from open_list import BucketOpenList, SpillingOpenList
+from pareto import ParetoArchive
+from relaxation import BatchRelaxationHeuristic
+from parallel import HeuristicPool
+from states import StateSpace
+from preprocessing import get_grounded_task
+from instrumentation import PhaseTimers, ProgressLog
+from policy_file import PolicyWriter, write_text_policy
+
+
+# Up to this size, Out (or pending) is scanned to compute the f-values and
+# select states. Larger ones are kept in the heaps of get_index, updated from
+# parent to child.
+SCAN_SIZE = 8
 
 
 class FondHeuristic(ABC):
-    def __init__(self, cp_heuristic: Heuristic) -> None:
+    def __init__(self, cp_heuristic: Heuristic, weight=1) -> None:
         # super().__init__()
         self.cp_heuristic = cp_heuristic
+        # Weight of the h-values (weighted A* style, 1 keeps f admissible)
+        self.weight = weight
     @abstractmethod
     def get_f_value(self, policy: Policy):
         pass
 
+    def get_heap(self, policy: Policy, pending_only=False):
+        return get_index(policy, self.__class__.__name__, self.cp_heuristic, self.entry, self.valid, pending_only)
+
+def get_index(policy: Policy, name, cp_heuristic, entry, valid, pending_only=False):
+    # Heap of entry(policy, state, h) over Out (or only the pending states),
+    # the state being the second item of the entries. A child inserts the
+    # states of policy.changed into the heap of its parent, and entries of
+    # states that left Out or got new g-values are dropped when they reach
+    # the top (valid is False). The heap is rebuilt when the parent's one is
+    # not up to date (e.g. Out was scanned).
+    cell = policy.aggregates.get(name, None)
+    if cell is not None and cell[1] is policy.token:
+        heap = cell[0]
+    else:
+        if pending_only:
+            contains = policy.pending.__contains__
+        else:
+            contains = lambda state: state in policy.pending or state in policy.goal_states
+        if cell is not None and cell[1] is policy.parent_token and policy.changed is not None:
+            # The Out of a child contains the Out of its parent: states that
+            # are not in it are dropped once for all the siblings, in the
+            # cell they share with the parent
+            heap = cell[0]
+            while heap is not None and not contains(leftist.top(heap)[1]):
+                heap = leftist.pop(heap)
+            cell[0] = heap
+            states = [state for state in policy.changed if contains(state)]
+        else:
+            heap = None
+            states = list(policy.pending) if pending_only else list(policy.pending.union(policy.goal_states))
+        for state, h in zip(states, cp_heuristic.values(states)):
+            heap = leftist.insert(heap, entry(policy, state, h))
+    while heap is not None and not valid(policy, leftist.top(heap)):
+        heap = leftist.pop(heap)
+    policy.aggregates[name] = [heap, policy.token]
+    return heap
+
 class BlindBestCaseHeuristic(FondHeuristic):
     def get_f_value(self, policy: Policy,):
         Out = policy.pending.union(policy.goal_states)
@@ -32,23 +86,35 @@ class BlindBestCaseHeuristic(FondHeuristic):
         return f_best
     
 class MinSumBestCaseHeuristic(FondHeuristic):
+    # min over Out of g + h, kept in a heap of (g + h, state, g) when Out is large
     def get_f_value(self, policy: Policy):
+        if len(policy.pending) + len(policy.goal_states) > SCAN_SIZE:
+            return leftist.top(self.get_heap(policy))[0]
+
         Out = policy.pending.union(policy.goal_states)
 
-        h_values = {state: self.cp_heuristic(SearchNode(state, None, None, 0)) for state in Out}
+        h_values = dict(zip(Out, self.cp_heuristic.values(Out)))
 
-        f_best = min([policy.get_best_g(state) + h_values[state] for state in Out], default=math.inf)
+        f_best = min([policy.get_best_g(state) + self.weight * h_values[state] for state in Out], default=math.inf)
 
         return f_best
 
+    def entry(self, policy: Policy, state, h):
+        g = policy.get_best_g(state)
+        return (g + self.weight * h, state, g)
+
+    def valid(self, policy: Policy, entry):
+        state = entry[1]
+        return (state in policy.pending or state in policy.goal_states) and policy.get_best_g(state) == entry[2]
+
 class SumMinBestCaseHeuristic(FondHeuristic):
     def get_f_value(self, policy: Policy):
         Out = policy.pending.union(policy.goal_states)
 
         g_values = [policy.get_best_g(state) for state in Out]
-        h_values = [self.cp_heuristic(SearchNode(state, None, None, 0)) for state in Out]
+        h_values = self.cp_heuristic.values(Out)
 
-        f_best = min(g_values, default=math.inf) + min(h_values, default=math.inf)
+        f_best = min(g_values, default=math.inf) + self.weight * min(h_values, default=math.inf)
 
         return f_best
     
@@ -61,20 +127,14 @@ class BlindWorstCaseHeuristic(FondHeuristic):
         return f_worst
 
 class MaxSumWorstCaseHeuristic(FondHeuristic):
+    # max over Out of g + h, kept in a heap of (-(g + h), state, g) when Out is large
     def get_f_value(self, policy: Policy):
-        Out = policy.pending.union(policy.goal_states)
-
-        h_values = {state: self.cp_heuristic(SearchNode(state, None, None, 0)) for state in Out}
-
-        f_worst_values = []
-        for state in Out:
-            g_worst = policy.get_worst_g(state)
-            h = h_values[state]
-            if g_worst == CYCLE_COST:
-                f_worst_values += [max(CYCLE_COST, h)]
-            else:
-                f_worst_values += [g_worst + h]
-        f_worst = max(f_worst_values, default=math.inf)
+        if len(policy.pending) + len(policy.goal_states) > SCAN_SIZE:
+            f_worst = -leftist.top(self.get_heap(policy))[0]
+        else:
+            Out = policy.pending.union(policy.goal_states)
+            h_values = dict(zip(Out, self.cp_heuristic.values(Out)))
+            f_worst = max([-self.entry(policy, state, h_values[state])[0] for state in Out], default=math.inf)
 
         # DEADLOCK in the policy: it cannot become proper
         if policy.cyclic and f_worst < CYCLE_COST:
@@ -82,19 +142,34 @@ class MaxSumWorstCaseHeuristic(FondHeuristic):
 
         return f_worst
 
+    def entry(self, policy: Policy, state, h):
+        g_worst = policy.get_worst_g(state)
+        h = self.weight * h
+        if g_worst == CYCLE_COST:
+            return (-max(CYCLE_COST, h), state, g_worst)
+        return (-(g_worst + h), state, g_worst)
+
+    def valid(self, policy: Policy, entry):
+        state = entry[1]
+        return (state in policy.pending or state in policy.goal_states) and policy.get_worst_g(state) == entry[2]
+
 class DeltaSizeHeuristic(FondHeuristic):
+    # max over i of h_vector[i] + i, h_vector being the h-values of the
+    # pending states in increasing order, is max(h) + |pending| - 1: only the
+    # largest h-value is needed, kept in a heap of (-h, state) when there are
+    # many pending states
     def get_f_value(self, policy: Policy):
-        Out = policy.pending.union(policy.goal_states)
+        if len(policy.pending) == 0:
+            return 0
+        if len(policy.pending) > SCAN_SIZE:
+            return -leftist.top(self.get_heap(policy, True))[0] + len(policy.pending) - 1
+        return max(self.cp_heuristic.values(list(policy.pending))) + len(policy.pending) - 1
 
-        h_values = {state: self.cp_heuristic(SearchNode(state, None, None, 0)) for state in Out}
+    def entry(self, policy: Policy, state, h):
+        return (-h, state)
 
-        h_vector = sorted([h_values[state] for state in policy.pending])
-        if len(h_vector) > 0:
-            f_size = max([h_vector[i] + i for i in range(len(h_vector))])
-        else:
-            f_size = 0
-            
-        return f_size
+    def valid(self, policy: Policy, entry):
+        return entry[1] in policy.pending
     
 # Dummy Size Heuristic to disable tie-breaking
 class ZeroSizeHeuristic(FondHeuristic):
@@ -112,58 +187,91 @@ class RandomStateSelector(StateSelector):
         state = policy.pending.pop()
         return state
     
-class BoundsFirstStateSelector(StateSelector):
+class IndexedStateSelector(StateSelector):
+    # Selects the pending state with the smallest entry(policy, state, h),
+    # (key, state, g) with g the g-value the key depends on. Large pending
+    # sets are indexed by get_index: the heap of a policy is inherited by its
+    # children, and the selected state is popped from it.
     def select_pending_state(self, policy:Policy, heuristic: Heuristic):
-        prio_list = []
-        if len(policy.goal_states) == 0:
-            for state in policy.pending:
-                heapq.heappush(prio_list, (policy.get_best_g(state) + heuristic(SearchNode(state, None, None, 0)),state))
+        name = self.get_name(policy)
+        if len(policy.pending) > SCAN_SIZE:
+            heap = get_index(policy, name, heuristic, self.entry, self.valid, True)
+            state = leftist.top(heap)[1]
+            policy.aggregates[name] = [leftist.pop(heap), policy.token]
         else:
-            for state in policy.pending:
-                heapq.heappush(prio_list, (-(policy.get_best_g(state) + heuristic(SearchNode(state, None, None, 0))),state))
-        g,state = heapq.heappop(prio_list)
+            pending = list(policy.pending)
+            state = min(self.entry(policy, state, h) for state, h in zip(pending, heuristic.values(pending)))[1]
         policy.pending.remove(state)
 
         return state
 
-class LargestGStateSelector(StateSelector):
-    def select_pending_state(self, policy:Policy, heuristic: Heuristic):
-        prio_list = []
-        for state in policy.pending:
-            heapq.heappush(prio_list, (-policy.get_worst_g(state),state))
-        policy.pending.remove(state)
+    def get_name(self, policy:Policy):
+        return self.__class__.__name__
 
-        return state
+    @abstractmethod
+    def entry(self, policy:Policy, state, h):
+        pass
 
-class BestStateSelector(StateSelector):
-    def select_pending_state(self, policy:Policy, heuristic: Heuristic):
-        prio_list = []
-        for state in policy.pending:
-            heapq.heappush(prio_list, (policy.get_best_g(state) + heuristic(SearchNode(state, None, None, 0)),state))
-        policy.pending.remove(state)
+    @abstractmethod
+    def valid(self, policy:Policy, entry):
+        pass
 
-        return state
+class BoundsFirstStateSelector(IndexedStateSelector):
+    # Lowest g + h first, then (once a goal is reached) the highest one
+    def get_name(self, policy:Policy):
+        if len(policy.goal_states) == 0:
+            return "BoundsFirstStateSelector.lowest"
+        return "BoundsFirstStateSelector.highest"
+
+    def entry(self, policy:Policy, state, h):
+        g = policy.get_best_g(state)
+        if len(policy.goal_states) == 0:
+            return (g + h, state, g)
+        return (-(g + h), state, g)
+
+    def valid(self, policy:Policy, entry):
+        return entry[1] in policy.pending and policy.get_best_g(entry[1]) == entry[2]
+
+class LargestGStateSelector(IndexedStateSelector):
+    def entry(self, policy:Policy, state, h):
+        g = policy.get_worst_g(state)
+        return (-g, state, g)
+
+    def valid(self, policy:Policy, entry):
+        return entry[1] in policy.pending and policy.get_worst_g(entry[1]) == entry[2]
+
+class BestStateSelector(IndexedStateSelector):
+    def entry(self, policy:Policy, state, h):
+        g = policy.get_best_g(state)
+        return (g + h, state, g)
+
+    def valid(self, policy:Policy, entry):
+        return entry[1] in policy.pending and policy.get_best_g(entry[1]) == entry[2]
 
 class OpenListSorter(ABC):
     @abstractmethod
-    def push(self, open_list, f_best, f_worst, f_size, policy):
+    def key(self, f_best, f_worst, f_size):
         pass
 
-class BestWorstOpenListSorter(OpenListSorter):
     def push(self, open_list, f_best, f_worst, f_size, policy):
-        heapq.heappush(open_list, ((f_best,f_worst,f_size),policy))
+        policy.f_value = self.key(f_best, f_worst, f_size)
+        open_list.push(policy.f_value, policy)
+
+class BestWorstOpenListSorter(OpenListSorter):
+    def key(self, f_best, f_worst, f_size):
+        return (f_best,f_worst,f_size)
 
 class WorstBestOpenListSorter(OpenListSorter):
-    def push(self, open_list, f_best, f_worst, f_size, policy):
-        heapq.heappush(open_list, ((f_worst,f_best,f_size),policy))
+    def key(self, f_best, f_worst, f_size):
+        return (f_worst,f_best,f_size)
 
 class BestOpenListSorter(OpenListSorter):
-    def push(self, open_list, f_best, f_worst, f_size, policy):
-        heapq.heappush(open_list, ((f_best,0,f_size),policy))
+    def key(self, f_best, f_worst, f_size):
+        return (f_best,0,f_size)
 
 class WorstOpenListSorter(OpenListSorter):
-    def push(self, open_list, f_best, f_worst, f_size, policy):
-        heapq.heappush(open_list, ((f_worst,0,f_size),policy))
+    def key(self, f_best, f_worst, f_size):
+        return (f_worst,0,f_size)
 
 
 def select_pending_state(policy, task, heuristic):
@@ -197,49 +305,61 @@ def update_g_values(policy, state, reached_states, task):
             # if reached_state != task.initial_state:
             policy.best_ancestors[reached_state] = state
             policy.worst_ancestors[reached_state] = state
+            policy.best_g[reached_state] = policy.best_g[state] + 1
+            worst_g = policy.worst_g[state]
+            policy.worst_g[reached_state] = worst_g if worst_g == CYCLE_COST else worst_g + 1
         # Not the first time
         else:
             all_new = False
 
     if not all_new:
         update_g_brute(policy, task)
+        # Store the g-values of the new ancestor chains
+        for reached_state in list(policy.best_ancestors):
+            policy.best_g[reached_state] = policy.walk_best_g(reached_state)
+            policy.worst_g[reached_state] = policy.walk_worst_g(reached_state)
+        # Any g-value may have changed: the f-value aggregates are rebuilt
+        return None
 
+    return list(reached_states)
 
-def update_g_brute(policy:Policy, task:Task):   
+
+def update_g_brute(policy:Policy, task:StateSpace):   
     # BRUTE FORCE: Compute al pi-trajectories
 
     trajectories = list()
     cycles = list()
-    frontier = {task.initial_state:[]}
+    # Stack of (state, ancestors): every trajectory is kept, even those
+    # reaching a state another pending trajectory reaches
+    frontier = [(task.initial_state, [])]
     while frontier:
-        state,ancestors = frontier.popitem()
+        state,ancestors = frontier.pop()
         action = policy.strategy.get(state, None)
         if action is None: #State has no action assigned: end of trajectory
             trajectories.append(ancestors)
         else: # State has action assigned
-            reached_states = {det_action.apply(state) for det_action in action[1]}
+            reached_states = policy.successors(state)
             for reached_state in reached_states:
                 if reached_state in ancestors: # Cycle
                     cycles.append(ancestors[ancestors.index(reached_state):]+[state])
                     pass
                 else: # Not a cycle
-                    aux1 = policy.get_worst_g(state)
-                    aux2 = policy.get_worst_g(policy.worst_ancestors[reached_state])
+                    aux1 = policy.walk_worst_g(state)
+                    aux2 = policy.walk_worst_g(policy.worst_ancestors[reached_state])
                     if aux1 > aux2:
                     # if policy.get_worst_g(state,task.initial_state) > policy.get_worst_g(policy.worst_ancestors[reached_state],task.initial_state):
                         policy.worst_ancestors[reached_state] = state
-                    if policy.get_best_g(state) < policy.get_best_g(policy.best_ancestors[reached_state]):
+                    if policy.walk_best_g(state) < policy.walk_best_g(policy.best_ancestors[reached_state]):
                         policy.best_ancestors[reached_state] = state
                     # Extend trajectory
                     new_ancestors = ancestors.copy()
                     new_ancestors.append(state)
-                    frontier[reached_state] = new_ancestors
+                    frontier.append((reached_state, new_ancestors))
     loopy_states = set().union(*cycles)
     extended_loopy_states = set()
     for cycle in cycles:
         for state in cycle:
-            action = policy.strategy.get(state, None)
-            reached_states = {det_action.apply(state) for det_action in action[1]}
+            reached_states = policy.successors(state)
             for reached_state in reached_states:
                 if reached_state not in loopy_states:
                     extended_loopy_states.add(reached_state)
@@ -251,27 +371,130 @@ def update_g_brute(policy:Policy, task:Task):
         if state not in already_seen:
             action = policy.strategy.get(state, None)
             if action is not None: #State has no action assigned: end of trajectory
-                reached_states = {det_action.apply(state) for det_action in action[1]}
+                reached_states = policy.successors(state)
                 for reached_state in reached_states:
                     policy.worst_ancestors[reached_state] = state
-                reached_states.difference_update(already_seen)
-                extended_loopy_states.update(reached_states)
+                extended_loopy_states.update(reached_states.difference(already_seen))
             already_seen.add(state)
         
 
-    if len(cycles) > 0:
-        policy.cyclic = True
+    policy.cyclic = policy.is_cyclic(task)
 
 
-def extend_policy(current_policy, state, nondet_action, det_actions, successors, task):
+def update_g_incremental(policy, state, reached_states, task):
+    # Same g-values as update_g_brute, but only the states downstream of the
+    # newly mapped state are revisited. best_g is the shortest pi-distance
+    # from the initial state, worst_g the longest one, or CYCLE_COST for the
+    # states reachable from a cycle. Ancestors are kept consistent with them.
+    # Returns the states reached for the first time or with new g-values.
+    best_g = policy.best_g[state] + 1
+    worst_g = policy.worst_g[state]
+    if worst_g != CYCLE_COST:
+        worst_g += 1
+
+    changed = []
+    seen_states = []
+    for reached_state in reached_states:
+        # First time reaching the state
+        if policy.best_ancestors.get(reached_state,None) is None:
+            policy.best_ancestors[reached_state] = state
+            policy.worst_ancestors[reached_state] = state
+            policy.best_g[reached_state] = best_g
+            policy.worst_g[reached_state] = worst_g
+            changed.append(reached_state)
+        else:
+            seen_states.append(reached_state)
+
+    if not seen_states:
+        return changed
+
+    # Best case: propagate decreasing g-values downstream
+    frontier = []
+    for reached_state in seen_states:
+        if best_g < policy.best_g[reached_state]:
+            policy.best_ancestors[reached_state] = state
+            policy.best_g[reached_state] = best_g
+            frontier.append(reached_state)
+    while frontier:
+        current = frontier.pop()
+        changed.append(current)
+        g = policy.best_g[current] + 1
+        for succ in policy.successors(current):
+            if g < policy.best_g[succ]:
+                policy.best_ancestors[succ] = current
+                policy.best_g[succ] = g
+                frontier.append(succ)
+
+    # A new cycle closes iff the mapped state is reachable from a successor
+    cycle_ancestor = None
+    parents = {reached_state: state for reached_state in seen_states}
+    frontier = list(seen_states)
+    while frontier and cycle_ancestor is None:
+        current = frontier.pop()
+        if current == state:
+            cycle_ancestor = parents[current]
+            break
+        for succ in policy.successors(current):
+            if succ not in parents:
+                parents[succ] = current
+                frontier.append(succ)
+
+    if cycle_ancestor is not None or worst_g == CYCLE_COST:
+        # Worst case: every state reachable from the cycle costs CYCLE_COST,
+        # its worst ancestor is chosen inside the cyclic region
+        if cycle_ancestor is not None:
+            policy.cyclic = True
+            policy.worst_ancestors[state] = cycle_ancestor
+            policy.worst_g[state] = CYCLE_COST
+            frontier = [state]
+        else:
+            frontier = []
+            for reached_state in seen_states:
+                if policy.worst_g[reached_state] != CYCLE_COST:
+                    policy.worst_ancestors[reached_state] = state
+                    policy.worst_g[reached_state] = CYCLE_COST
+                    frontier.append(reached_state)
+        while frontier:
+            current = frontier.pop()
+            changed.append(current)
+            for succ in policy.successors(current):
+                if policy.worst_g[succ] != CYCLE_COST:
+                    policy.worst_ancestors[succ] = current
+                    policy.worst_g[succ] = CYCLE_COST
+                    frontier.append(succ)
+    else:
+        # Worst case: propagate increasing g-values downstream (acyclic part)
+        frontier = []
+        for reached_state in seen_states:
+            g = policy.worst_g[reached_state]
+            if g != CYCLE_COST and worst_g > g:
+                policy.worst_ancestors[reached_state] = state
+                policy.worst_g[reached_state] = worst_g
+                frontier.append(reached_state)
+        while frontier:
+            current = frontier.pop()
+            changed.append(current)
+            g = policy.worst_g[current] + 1
+            for succ in policy.successors(current):
+                succ_g = policy.worst_g[succ]
+                if succ_g != CYCLE_COST and g > succ_g:
+                    policy.worst_ancestors[succ] = current
+                    policy.worst_g[succ] = g
+                    frontier.append(succ)
+
+    return changed
+
+
+def extend_policy(current_policy, state, nondet_action, det_actions, successors, task, update_g=update_g_incremental):
     new_policy = current_policy.copy()
     new_policy.strategy[state] = (nondet_action, det_actions)
+    new_policy.strategy_hash ^= zobrist_key(state, nondet_action)
 
     # TODO: is it better to compute the pending first? 
     # if every successor is in new_pending then no need update_g_brute?
 
     # Update the g-values (ancestors) of the reached states 
-    update_g_values(new_policy,state,successors, task)
+    new_policy.changed = update_g(new_policy,state,successors, task)
 
     # Compute pending tiles for the new policy
     new_pending = [succ for succ in successors if not task.goal_reached(succ) and new_policy.strategy.get(succ,None) is None]
@@ -358,40 +581,93 @@ def boand_star(
         use_best_case_heuristic = "MinSum",
         use_worst_case_heuristic = "MaxSum",
         use_size_heuristic = "Delta",
-        use_selector = "bounds_first"):
+        use_selector = "bounds_first",
+        heuristic_cache_size = None,
+        use_g_update = "incremental",
+        use_duplicate_detection = "none",
+        transition_cache_size = None,
+        processes = 1,
+        task_cache_dir = None,
+        use_ties = "lifo",
+        use_evaluation = "eager",
+        sweep_open_list = False,
+        time_limit = None,
+        memory_limit = None,
+        expansion_limit = None,
+        best_weight = 1,
+        worst_weight = 1,
+        epsilon = 0,
+        phase_timers = False,
+        progress_interval = None,
+        max_resident_policies = None,
+        spill_dir = None,
+        solution_format = "text"):
+    # Generator: yields each Pareto-optimal policy with its row of stats as
+    # soon as it is found. Returns the budget that stopped the search
+    # (None if the frontier is complete).
+    # phase_timers writes the time spent in each phase to a .phases file and
+    # progress_interval (seconds) snapshots of the search to a .progress file.
+    # With max_resident_policies, the open list keeps at most that many
+    # policies in memory and spills the others to spill_dir (or a temporary
+    # folder): the search and its results are the same.
+    # solution_format "binary" writes all the solutions to a single
+    # .boand.pol file (see policy_file) instead of a .boand.NNN.out each.
     
     pname = problem_file[problem_file.rfind("/")+1:][:-5]
 
-    # Read FOND task
-    domain = parse_domain(domain_file)
-    problem = parse_problem(problem_file)
+    # Read FOND task (or its grounding from the task cache)
+    timings = dict()
+    grounded_task = get_grounded_task(domain_file, problem_file, task_cache_dir, timings)
 
-    task = get_alloutcome_determinization(domain, problem)
+    # The search runs on interned states (int ids), the classical
+    # heuristics on the grounded task
+    start = time.time()
+    task = StateSpace(grounded_task, transition_cache_size)
+    timings["index"] = time.time() - start
 
     # CONFIG
 
     if use_cp_heuristic == "hmax":
-        cp_heuristic = hMaxHeuristic(task)
+        cp_heuristic = BatchRelaxationHeuristic(task, "max")
+    elif use_cp_heuristic == "hadd":
+        cp_heuristic = BatchRelaxationHeuristic(task, "sum")
     elif use_cp_heuristic == "lmcut":
-        cp_heuristic = LmCutHeuristic(task)
+        cp_heuristic = LmCutHeuristic(grounded_task)
     else:
-        print("heuristic must be 'hmax' or 'lmcut'")
+        print("heuristic must be 'hmax', 'hadd' or 'lmcut'")
+        exit()
+
+    # Children of an expansion get their new states evaluated in parallel
+    heuristic_pool = None
+    if processes > 1:
+        heuristic_pool = HeuristicPool(cp_heuristic, task, processes)
+
+    # Every FondHeuristic and the selector share the same h-value cache
+    cp_heuristic = HeuristicCache(cp_heuristic, heuristic_cache_size, task.decode)
+    evaluate_batch = cp_heuristic.evaluate_batch
+    if heuristic_pool is not None:
+        evaluate_batch = heuristic_pool.evaluate
+
+    # Bounded suboptimal search: every point of the Pareto frontier is
+    # approximated within a factor max(best_weight, worst_weight) * (1 + epsilon)
+    if best_weight < 1 or worst_weight < 1 or epsilon < 0:
+        print("heuristic weights must be >= 1 and epsilon >= 0")
         exit()
 
     if use_best_case_heuristic == "Blind":
-        best_heuristic = BlindBestCaseHeuristic(cp_heuristic)
+        best_heuristic = BlindBestCaseHeuristic(cp_heuristic, best_weight)
     elif use_best_case_heuristic == "SumMin":
-        best_heuristic = SumMinBestCaseHeuristic(cp_heuristic)
+        best_heuristic = SumMinBestCaseHeuristic(cp_heuristic, best_weight)
     elif use_best_case_heuristic == "MinSum":
-        best_heuristic = MinSumBestCaseHeuristic(cp_heuristic)
+        best_heuristic = MinSumBestCaseHeuristic(cp_heuristic, best_weight)
     else:
         print("Best Case Heuristic must be 'Blind', 'SumMin' or 'MinSum'")
         exit()
 
     if use_worst_case_heuristic == "Blind":
-        worst_heuristic = BlindWorstCaseHeuristic(cp_heuristic)
+        worst_heuristic = BlindWorstCaseHeuristic(cp_heuristic, worst_weight)
     elif use_worst_case_heuristic == "MaxSum":
-        worst_heuristic = MaxSumWorstCaseHeuristic(cp_heuristic)
+        worst_heuristic = MaxSumWorstCaseHeuristic(cp_heuristic, worst_weight)
     else:
         print("Worst Case Heuristic must be 'Blind' or 'MaxSum'")
         exit()
@@ -416,6 +692,20 @@ def boand_star(
         print("selector must be 'random' or 'bounds'")
         exit()
 
+    if use_g_update == "incremental":
+        update_g = update_g_incremental
+    elif use_g_update == "brute":
+        update_g = update_g_values
+    else:
+        print("g-value update must be 'incremental' or 'brute'")
+        exit()
+
+    if use_duplicate_detection not in ["none", "generation", "expansion", "both"]:
+        print("duplicate detection must be 'none', 'generation', 'expansion' or 'both'")
+        exit()
+    prune_at_generation = use_duplicate_detection in ["generation", "both"]
+    prune_at_expansion = use_duplicate_detection in ["expansion", "both"]
+
     if use_metric == "bw":
         openListSorter = BestWorstOpenListSorter()
     elif use_metric == "wb":
@@ -428,161 +718,306 @@ def boand_star(
         print("metric must be 'b' (best), 'w' (worst), 'bw' (best,worst) or 'wb' (worst,best).")
         exit()
 
+    if use_ties not in ["fifo", "lifo"]:
+        print("ties must be 'fifo' or 'lifo'")
+        exit()
+    if use_evaluation not in ["eager", "lazy"]:
+        print("evaluation must be 'eager' or 'lazy'")
+        exit()
+    # Lazy evaluation: children are pushed with the f-value of their parent
+    # and only evaluated when popped
+    lazy_evaluation = use_evaluation == "lazy"
+
+    if solution_format not in ["text", "binary"]:
+        print("solution format must be 'text' or 'binary'")
+        exit()
+
     Path(solution_folder).mkdir(parents=True, exist_ok=True)
-    
-    # hcache = dict()
+    write_timings(timings, pname, solution_folder)
+    policy_writer = None
+    if solution_format == "binary":
+        policy_writer = PolicyWriter("{}/{}.boand.pol".format(solution_folder, pname), task)
+
+    # Phases of the loop, timed only when asked for: the timers wrap these
+    # functions, the loop is untouched otherwise
+    extend = extend_policy
+    is_proper = Policy.is_proper
+    timers = None
+    if phase_timers:
+        timers = PhaseTimers()
+        extend = timers.wrap("extend", extend)
+        update_g = timers.wrap("update_g", update_g)
+        is_proper = timers.wrap("is_proper", is_proper)
+        task.get_nondet_successors = timers.wrap("successors", task.get_nondet_successors)
+        selector.select_pending_state = timers.wrap("select", selector.select_pending_state)
+        best_heuristic.get_f_value = timers.wrap("f_best", best_heuristic.get_f_value)
+        worst_heuristic.get_f_value = timers.wrap("f_worst", worst_heuristic.get_f_value)
+        size_heuristic.get_f_value = timers.wrap("f_size", size_heuristic.get_f_value)
+        if evaluate_batch is not None:
+            evaluate_batch = timers.wrap("evaluate_batch", evaluate_batch)
+
 
     # Initialize open and closed list
-    open_list = []
-    # closed_list = set()
+    # Policies are identified by their Zobrist strategy hash (64 bits, so
+    # collisions are neglected)
+    if max_resident_policies is None:
+        open_list = BucketOpenList(use_ties)
+    else:
+        # The strategies refer to the actions and operators of the task, and
+        # these to the task itself: all of them are written by reference
+        shared = [task, task.transitions] + task.nondet_actions + task.operators
+        open_list = SpillingOpenList(max_resident_policies, use_ties, spill_dir, shared, SHARED_TYPES)
+    if timers is not None:
+        open_list.push = timers.wrap("open_push", open_list.push)
+        open_list.pop = timers.wrap("open_pop", open_list.pop)
+    closed_list = set()
+    generated = set()
     
     # Generate empty policy
-    empty_policy = Policy(dict(),set(), set())
+    empty_policy = Policy(dict(),set(), set(), task.transitions)
     empty_policy.pending.add(task.initial_state)
-    empty_policy.best_ancestors = {task.initial_state:"dummy"}
-    empty_policy.worst_ancestors = {task.initial_state:"dummy"}
+    empty_policy.best_ancestors[task.initial_state] = "dummy"
+    empty_policy.worst_ancestors[task.initial_state] = "dummy"
+    empty_policy.best_g[task.initial_state] = 0
+    empty_policy.worst_g[task.initial_state] = 0
     # Push the empty policy onto the open list
-    heapq.heappush(open_list, ((0,0), empty_policy))
+    empty_policy.f_value = (0,0)
+    open_list.push(empty_policy.f_value, empty_policy)
+    generated.add(hash(empty_policy))
 
-    pareto_frontier = []
-    pareto_f = (math.inf, math.inf)
-    # repeated = 0
-    stats = {"best":[], "worst":[], "size":[], "time":[], "iterations":[], "expansions":[], "generations":[], "max_open":[]}
+    solutions = 0
+    # f-values of the solutions: policies they dominate are pruned
+    pareto_archive = ParetoArchive(epsilon)
+    duplicates = 0
+    dominated = 0
+    clear_stats(pname, solution_folder)
 
     max_open = 0
+    evaluations = 0
     it = 0
     expansions = 0
     generations = 0
+    stop_reason = None
+    progress_log = None
+    if progress_interval is not None:
+        progress_log = ProgressLog("{}/{}.progress".format(solution_folder, pname), progress_interval)
     start_time = time.time()
-    # Loop until the open list is empty
-    while open_list:
-        # Get the policy with the lowest f value
-        f_value, current_policy = heapq.heappop(open_list)
-        it += 1
-
-        # Pruning non-Pareto solutions
-        if f_value[0] >= pareto_f[0] and f_value[1] >= pareto_f[1]:
-            continue
-
-        # CLOSED LIST SEEMS UNNECESSARY
-        # hashable_strategy = frozenset(current_policy.strategy.items())
-        # if hashable_strategy in closed_list:
-        #     repeated += 1
-        #     pass # Add a breakpoint here to see hits
-        # closed_list.add(hashable_strategy)
-        
-
-        # Check if the policy is closed
-        if current_policy.is_closed():
-            # If closed and proper, it is a solution
-            if current_policy.is_proper(task):
-                pareto_frontier += [current_policy]
-                pareto_f = (f_value[0], f_value[1])
-                
-                elapsed_time = time.time() - start_time
-
+    try:
+        # Loop until the open list is empty
+        while open_list:
+            # Budgets: stop before the frontier is complete
+            if time_limit is not None and time.time() - start_time > time_limit:
+                stop_reason = "time"
+                break
+            if expansion_limit is not None and expansions >= expansion_limit:
+                stop_reason = "expansions"
+                break
+            if memory_limit is not None and it % 100 == 0 and get_memory_usage() > memory_limit:
+                stop_reason = "memory"
+                break
+
+            if progress_log is not None:
+                progress_log.update(it, expansions, len(open_list), solutions)
+
+            # Get the policy with the lowest f value
+            f_value, current_policy = open_list.pop()
+            it += 1
+
+            # Deferred evaluation: back to the open list under its own f-value
+            # (it is the next one popped if that one is not larger)
+            if current_policy.f_value is None:
                 f_best = best_heuristic.get_f_value(current_policy)
                 f_worst = worst_heuristic.get_f_value(current_policy)
+                f_size = size_heuristic.get_f_value(current_policy)
+                evaluations += 1
+                if f_worst == math.inf or f_size == math.inf:
+                    continue
+                current_policy.f_value = openListSorter.key(f_best, f_worst, f_size)
+                # Children dominated by a solution are not pushed back
+                if pareto_archive.dominates(current_policy.f_value):
+                    dominated += 1
+                    continue
+                if current_policy.f_value != f_value:
+                    open_list.push(current_policy.f_value, current_policy)
+                    continue
+
+            # Pruning non-Pareto solutions
+            if pareto_archive.dominates(f_value):
+                continue
 
-                stats["best"] += [f_best]
-                stats["worst"] += [f_worst]
-                stats["size"] += [len(current_policy.strategy)]
-                stats["time"] += [elapsed_time]
-                stats["iterations"] += [it]
-                stats["expansions"] += [expansions]
-                stats["generations"] += [generations]
-                stats["max_open"] += [max_open]
-
+            # Duplicate detection: the same partial policy was already popped
+            if prune_at_expansion:
+                if hash(current_policy) in closed_list:
+                    duplicates += 1
+                    continue
+                closed_list.add(hash(current_policy))
+
+            # Check if the policy is closed
+            if current_policy.is_closed():
+                # If closed and proper, it is a solution
+                if is_proper(current_policy, task):
+                    solutions += 1
+                    pareto_archive.add(f_value)
+
+                    # Drop the policies that the new solution dominates (those
+                    # waiting for their evaluation are kept)
+                    if sweep_open_list:
+                        dominated += open_list.discard(pareto_archive.dominates, lambda policy: policy.f_value is None)
                 
-                write_solution(current_policy, len(pareto_frontier),pname, solution_folder)
-                write_stats(stats, pname, solution_folder)
+                    elapsed_time = time.time() - start_time
+
+                    f_best = best_heuristic.get_f_value(current_policy)
+                    f_worst = worst_heuristic.get_f_value(current_policy)
+
+                    stats = {
+                        "best": f_best,
+                        "worst": f_worst,
+                        "size": len(current_policy.strategy),
+                        "time": elapsed_time,
+                        "iterations": it,
+                        "expansions": expansions,
+                        "generations": generations,
+                        "max_open": max_open,
+                        "h_hits": cp_heuristic.hits,
+                        "h_misses": cp_heuristic.misses,
+                        "duplicates": duplicates,
+                        "t_hits": task.transitions.hits,
+                        "t_misses": task.transitions.misses,
+                        "evaluations": evaluations,
+                        "dominated": dominated,
+                        "spilled": getattr(open_list, "spilled", 0)}
+
+                    if policy_writer is not None:
+                        policy_writer.write(current_policy, f_best, f_worst)
+                    else:
+                        write_solution(current_policy, solutions,pname, solution_folder, task)
+                    append_stats(stats, pname, solution_folder)
+                    yield current_policy, stats
                 
-            # Closed policies cannot be expanded
-            continue
-
-        ### EXPANSION ###
-        expansions += 1
-        # Select a state from Out~(current_policy)
-        state = selector.select_pending_state(current_policy, cp_heuristic)
-
-        op_successors = task.get_successor_states(state)
-        nondet_action_to_successors = dict()
-        # TODO: caching?
-        nondet_to_det_action = dict()
-        for (op,succ) in op_successors:
-            nondet_action = re.sub('_detdup_' + '[0-9]*', '', op.name)
-
-            successors = nondet_action_to_successors.get(nondet_action, set())
-            successors.add(succ)
-            nondet_action_to_successors[nondet_action] = successors
-
-            det_actions = nondet_to_det_action.get(nondet_action, set())
-            det_actions.add(op)
-            nondet_to_det_action[nondet_action] = det_actions
-
-
-        for (nondet_action,successors) in nondet_action_to_successors.items():
-            # Create new_policy by extending current_policy
-            # Extension: map tile to action
-            new_policy = extend_policy(current_policy, state, nondet_action, nondet_to_det_action[nondet_action], nondet_action_to_successors[nondet_action], task)
-            generations += 1
-
-            # Calculate new_policy's f-value
-            f_best = best_heuristic.get_f_value(new_policy)
-            f_worst = worst_heuristic.get_f_value(new_policy)
-            f_size = size_heuristic.get_f_value(new_policy)
-
-            # Uncomment to discard weak policies
-            if f_worst == math.inf or f_size == math.inf:
+                # Closed policies cannot be expanded
                 continue
 
-            # Uncomment to discard cyclic policies
-            # if new_policy.cyclic:
-            #     continue
-
-            # Add the child to the open list
-            openListSorter.push(open_list,f_best,f_worst,f_size,new_policy)
-            # heapq.heappush(open_list, ((f_best,f_worst,f_close),new_policy)) # BEST then WORST
-            # heapq.heappush(open_list, ((f_worst,f_best,f_close),new_policy)) # WORST then BEST
-
-        max_open = max(max_open, len(open_list))
-
-    elapsed_time = time.time() - start_time
-
-    stats["best"] += [-1]
-    stats["worst"] += [-1]
-    stats["size"] += [-1]
-    stats["time"] += [elapsed_time]
-    stats["iterations"] += [it]
-    stats["expansions"] += [expansions]
-    stats["generations"] += [generations]
-    stats["max_open"] += [max_open]
-    
-    write_stats(stats, pname, solution_folder)
+            ### EXPANSION ###
+            expansions += 1
+            # Select a state from Out~(current_policy)
+            state = selector.select_pending_state(current_policy, cp_heuristic)
+
+            # Outcomes are grouped by nondeterministic action in the task index
+            groups = task.get_nondet_successors(state)
+
+            # The new states of all children are evaluated at once, by the
+            # worker pool or by a batch heuristic. The f-values below are then
+            # computed sequentially from the cache, so the search is the same.
+            if evaluate_batch is not None:
+                cp_heuristic.prefetch([succ for (_, _, successors) in groups for succ in successors], evaluate_batch)
+
+            for (nondet_action, det_actions, successors) in groups:
+                # Create new_policy by extending current_policy
+                # Extension: map tile to action
+                new_policy = extend(current_policy, state, nondet_action, det_actions, successors, task, update_g)
+                generations += 1
+
+                # Duplicate detection: the same partial policy was already generated
+                if prune_at_generation:
+                    if hash(new_policy) in generated:
+                        duplicates += 1
+                        continue
+                    generated.add(hash(new_policy))
+
+                if lazy_evaluation:
+                    open_list.push(current_policy.f_value, new_policy)
+                    continue
+
+                # Calculate new_policy's f-value
+                evaluations += 1
+                f_best = best_heuristic.get_f_value(new_policy)
+                f_worst = worst_heuristic.get_f_value(new_policy)
+                f_size = size_heuristic.get_f_value(new_policy)
+
+                # Uncomment to discard weak policies
+                if f_worst == math.inf or f_size == math.inf:
+                    continue
+
+                # Children dominated by a solution are not pushed
+                if pareto_archive.dominates(openListSorter.key(f_best, f_worst, f_size)):
+                    dominated += 1
+                    continue
+
+                # Uncomment to discard cyclic policies
+                # if new_policy.cyclic:
+                #     continue
+
+                # Add the child to the open list
+                openListSorter.push(open_list,f_best,f_worst,f_size,new_policy)
+                # heapq.heappush(open_list, ((f_best,f_worst,f_close),new_policy)) # BEST then WORST
+                # heapq.heappush(open_list, ((f_worst,f_best,f_close),new_policy)) # WORST then BEST
+
+            max_open = max(max_open, len(open_list))
+
+        if stop_reason is not None:
+            return stop_reason
+
+        elapsed_time = time.time() - start_time
+
+        stats = {
+            "best": -1,
+            "worst": -1,
+            "size": -1,
+            "time": elapsed_time,
+            "iterations": it,
+            "expansions": expansions,
+            "generations": generations,
+            "max_open": max_open,
+            "h_hits": cp_heuristic.hits,
+            "h_misses": cp_heuristic.misses,
+            "duplicates": duplicates,
+            "t_hits": task.transitions.hits,
+            "t_misses": task.transitions.misses,
+            "evaluations": evaluations,
+            "dominated": dominated,
+            "spilled": getattr(open_list, "spilled", 0)}
+        append_stats(stats, pname, solution_folder)
+
+    finally:
+        if heuristic_pool is not None:
+            heuristic_pool.close()
+        open_list.close()
+        if policy_writer is not None:
+            policy_writer.close()
+        if progress_log is not None:
+            progress_log.write(time.time(), it, expansions, len(open_list), solutions)
+        if timers is not None:
+            timers.write("{}/{}.phases".format(solution_folder, pname))
+
+
+def write_solution(policy, sol_number, pname, solution_folder, task):
+
+    items = ((task.decode(state), action[0]) for state, action in policy.strategy.items())
+    with open("{}/{}.boand.{}.out".format(solution_folder, pname, str(sol_number).zfill(3)), "w") as out:
+        write_text_policy(out, items)
 
-    # print(len(closed_list))
-    return pareto_frontier
+def write_timings(timings, pname, solution_folder):
 
+    timings_str = ""
+    for stage, seconds in timings.items():
+        timings_str += "{};{}\n".format(stage, seconds)
 
-def write_solution(policy, sol_number, pname, solution_folder):
+    with open("{}/{}.timings".format(solution_folder, pname), "w") as out:
+        out.write(timings_str)
 
-    policy_str = ""
-    for state, action in policy.strategy.items():
-        policy_str += "If holds: " + "/".join(state) + "\n"
-        policy_str += "Execute: %s\n" % action[0]
-        policy_str += "\n"
+def clear_stats(pname, solution_folder):
 
-    with open("{}/{}.boand.{}.out".format(solution_folder, pname, str(sol_number).zfill(3)), "w") as out:
-        out.write(policy_str)
+    with open("{}/{}.stats".format(solution_folder, pname), "w") as out:
+        pass
 
-def write_stats(stats, pname, solution_folder):
+def append_stats(stats, pname, solution_folder):
 
-    stats_str = ""
-    for i in range(len(stats["best"])):
-        stats_str += ";".join(map(str,[stats["best"][i], stats["worst"][i], stats["size"][i], stats["time"][i], stats["iterations"][i], stats["expansions"][i], stats["generations"][i], stats["max_open"][i]])) + "\n"
+    with open("{}/{}.stats".format(solution_folder, pname), "a") as out:
+        out.write(";".join(map(str,stats.values())) + "\n")
 
-    with open("{}/{}.stats".format(solution_folder, pname), "w") as out:
-        out.write(stats_str)
+def get_memory_usage():
+    # Peak resident memory of the process in MB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
 
 
 def main(argv, arc):
@@ -618,8 +1053,102 @@ def main(argv, arc):
     if "-s" in argv:
         index = argv.index("-s")
         selector = argv[index+1]
+    heuristic_cache_size = None
+    if "-hc" in argv:
+        index = argv.index("-hc")
+        heuristic_cache_size = int(argv[index+1])
+    g_update = "incremental"
+    if "-g" in argv:
+        index = argv.index("-g")
+        g_update = argv[index+1]
+    duplicate_detection = "none"
+    if "-dd" in argv:
+        index = argv.index("-dd")
+        duplicate_detection = argv[index+1]
+    transition_cache_size = None
+    if "-tc" in argv:
+        index = argv.index("-tc")
+        transition_cache_size = int(argv[index+1])
+    processes = 1
+    if "-j" in argv:
+        index = argv.index("-j")
+        processes = int(argv[index+1])
+    task_cache_dir = None
+    if "-gc" in argv:
+        index = argv.index("-gc")
+        task_cache_dir = argv[index+1]
+    ties = "lifo"
+    if "-ot" in argv:
+        index = argv.index("-ot")
+        ties = argv[index+1]
+    evaluation = "eager"
+    if "-ev" in argv:
+        index = argv.index("-ev")
+        evaluation = argv[index+1]
+    sweep = False
+    if "-sw" in argv:
+        index = argv.index("-sw")
+        sweep = argv[index+1] == "1"
+    time_limit = None
+    if "-tl" in argv:
+        index = argv.index("-tl")
+        time_limit = float(argv[index+1])
+    memory_limit = None
+    if "-ml" in argv:
+        index = argv.index("-ml")
+        memory_limit = float(argv[index+1])
+    expansion_limit = None
+    if "-el" in argv:
+        index = argv.index("-el")
+        expansion_limit = int(argv[index+1])
+    best_weight = 1
+    if "-bhw" in argv:
+        index = argv.index("-bhw")
+        best_weight = float(argv[index+1])
+    worst_weight = 1
+    if "-whw" in argv:
+        index = argv.index("-whw")
+        worst_weight = float(argv[index+1])
+    epsilon = 0
+    if "-eps" in argv:
+        index = argv.index("-eps")
+        epsilon = float(argv[index+1])
+    phase_timers = False
+    if "-pt" in argv:
+        index = argv.index("-pt")
+        phase_timers = argv[index+1] == "1"
+    progress_interval = None
+    if "-pl" in argv:
+        index = argv.index("-pl")
+        progress_interval = float(argv[index+1])
+    max_resident_policies = None
+    if "-mr" in argv:
+        index = argv.index("-mr")
+        max_resident_policies = int(argv[index+1])
+    spill_dir = None
+    if "-sd" in argv:
+        index = argv.index("-sd")
+        spill_dir = argv[index+1]
+    solution_format = "text"
+    if "-sf" in argv:
+        index = argv.index("-sf")
+        solution_format = argv[index+1]
     
-    boand_star(domain_file, problem_file, solution_folder, use_metric=metric, use_cp_heuristic=heuristic, use_best_case_heuristic=best_heuristic, use_worst_case_heuristic=worst_heuristic, use_size_heuristic=size_heuristic, use_selector=selector)
+    search = boand_star(domain_file, problem_file, solution_folder, use_metric=metric, use_cp_heuristic=heuristic, use_best_case_heuristic=best_heuristic, use_worst_case_heuristic=worst_heuristic, use_size_heuristic=size_heuristic, use_selector=selector, heuristic_cache_size=heuristic_cache_size, use_g_update=g_update, use_duplicate_detection=duplicate_detection, transition_cache_size=transition_cache_size, processes=processes, task_cache_dir=task_cache_dir, use_ties=ties, use_evaluation=evaluation, sweep_open_list=sweep, time_limit=time_limit, memory_limit=memory_limit, expansion_limit=expansion_limit, best_weight=best_weight, worst_weight=worst_weight, epsilon=epsilon, phase_timers=phase_timers, progress_interval=progress_interval, max_resident_policies=max_resident_policies, spill_dir=spill_dir, solution_format=solution_format)
+    # Solutions are written as they are found
+    if "--profile" in argv:
+        # cProfile of the whole run (preprocessing included), dumped next to
+        # the solutions. Read with: python -m pstats <file>.prof
+        pname = problem_file[problem_file.rfind("/")+1:][:-5]
+        profiler = cProfile.Profile()
+        profiler.enable()
+        for policy, stats in search:
+            pass
+        profiler.disable()
+        profiler.dump_stats("{}/{}.prof".format(solution_folder, pname))
+    else:
+        for policy, stats in search:
+            pass
  
 
 def test():
@@ -641,7 +1170,7 @@ def test():
     domain_file = "benchmarks/{}/domain.pddl".format(domain)
     problem_file = "benchmarks/{}/motivating.pddl".format(domain)
 
-    solution = boand_star(domain_file, problem_file, problem_file[:problem_file.rfind("/")], use_metric="bw", use_cp_heuristic="hmax", use_best_case_heuristic="MinSum", use_worst_case_heuristic="MaxSum", use_size_heuristic="Zero", use_selector="random")
+    solution = list(boand_star(domain_file, problem_file, problem_file[:problem_file.rfind("/")], use_metric="bw", use_cp_heuristic="hmax", use_best_case_heuristic="MinSum", use_worst_case_heuristic="MaxSum", use_size_heuristic="Zero", use_selector="random"))
 
 if __name__ == '__main__':
     main(sys.argv, len(sys.argv))
@@ -1,34 +1,88 @@
 
+from persistent import PersistentDict, PersistentSet
+
 CYCLE_COST = 999999
 
+# Zobrist keys: the hash of a strategy is the XOR of the keys of its
+# (state, action) pairs, so it is updated in O(1) when a pair is added.
+# A key is the splitmix64 mix of the pair, computed on demand: no table
+# keeps the actions (and through them the task) alive after the search.
+_MASK = (1 << 64) - 1
+
+def zobrist_key(state, nondet_action):
+    x = ((state << 32) | nondet_action.id) + 0x9E3779B97F4A7C15 & _MASK
+    x = (x ^ (x >> 30)) * 0xBF58476D1CE4E5B9 & _MASK
+    x = (x ^ (x >> 27)) * 0x94D049BB133111EB & _MASK
+    return x ^ (x >> 31)
+
 class Policy:
-  def __init__(self, strategy, pending, goal_states):
-    self.strategy = strategy  # tile-action map
+  def __init__(self, strategy, pending, goal_states, transitions=None):
+    # Persistent containers: copies share their entries with the parent
+    # and only store what changed since then
+    self.strategy = PersistentDict(strategy)  # tile-action map
     
     # Pending are tiles reached that have not been mapped to an action yet
-    self.pending = pending # tiles pending and their g values
-    self.goal_states = goal_states
+    self.pending = PersistentSet(pending) # tiles pending and their g values
+    self.goal_states = PersistentSet(goal_states)
     
-    self.best_ancestors = dict()
-    self.worst_ancestors = dict()
+    self.best_ancestors = PersistentDict()
+    self.worst_ancestors = PersistentDict()
+
+    # g-values of the states reached by the policy, kept up to date with
+    # the ancestors by the g update (CYCLE_COST marks the states that are
+    # reachable from a cycle)
+    self.best_g = PersistentDict()
+    self.worst_g = PersistentDict()
+
+    self.strategy_hash = 0
+
+    # Shared TransitionTable of the task (None: apply the outcomes)
+    self.transitions = transitions
 
     self.closed = False
     self.cyclic = False
     self.proper = False
 
+    # Open list key, None until the policy is evaluated
+    self.f_value = None
+
+    # Heaps of the f-value aggregates, by heuristic: (heap, token of the
+    # policy they are up to date with). A child starts from the heaps of its
+    # parent and only inserts the states in changed (those reached or with
+    # new g-values since the parent, None if unknown)
+    self.aggregates = dict()
+    self.token = object()
+    self.parent_token = None
+    self.changed = None
+
   def copy(self):
-    new_policy = Policy(dict(),set(),set())
+    new_policy = Policy.__new__(Policy)
     new_policy.strategy = self.strategy.copy()
     new_policy.pending = self.pending.copy()
     new_policy.goal_states = self.goal_states.copy()
     new_policy.best_ancestors = self.best_ancestors.copy()
     new_policy.worst_ancestors = self.worst_ancestors.copy()
+    new_policy.best_g = self.best_g.copy()
+    new_policy.worst_g = self.worst_g.copy()
+    new_policy.strategy_hash = self.strategy_hash
+    new_policy.transitions = self.transitions
     new_policy.closed = self.closed
     new_policy.cyclic = self.cyclic
     new_policy.proper = self.proper
+    new_policy.f_value = None
+    new_policy.aggregates = self.aggregates.copy()
+    new_policy.token = object()
+    new_policy.parent_token = self.token
+    new_policy.changed = None
 
     return new_policy
 
+  def __getstate__(self):
+    # The aggregates are rebuilt after unpickling
+    state = self.__dict__.copy()
+    state["aggregates"] = dict()
+    return state
+
   def __lt__(self, other):
     # if self.best_f < other.best_f:
     #   return True
@@ -40,10 +94,28 @@ class Policy:
     
   def __eq__(self, other):
     if isinstance(other, Policy):
-        return self.strategy == other.strategy
+        return self.strategy_hash == other.strategy_hash and self.strategy == other.strategy
     return False
+
+  def __hash__(self):
+    return self.strategy_hash
   
+  def successors(self, state):
+      action = self.strategy.get(state, None)
+      if action is None:
+          return frozenset()
+      if self.transitions is not None:
+          return self.transitions.successors(state, action[0], action[1])
+      return frozenset(det_action.apply(state) for det_action in action[1])
+
   def get_best_g(self, state):
+      return self.best_g[state]
+
+  def get_worst_g(self, state):
+      return self.worst_g[state]
+
+  # g-values recomputed from the ancestor chains, for the brute force update
+  def walk_best_g(self, state):
       current = state
       g = 0
       while current != "dummy":
@@ -51,7 +123,7 @@ class Policy:
           g+=1
       return g-1
 
-  def get_worst_g(self,state):
+  def walk_worst_g(self,state):
       ancestors = set()
       ancestors.add(state)
       
@@ -66,36 +138,67 @@ class Policy:
       return g-1
     
   
+  def components(self, task):
+      # Strongly connected components of the states reached from the initial
+      # state (iterative Tarjan). They come out in reverse topological
+      # order: a component after every component it reaches.
+      root = task.initial_state
+      index = {root: 0}
+      low = {root: 0}
+      stack = [root]
+      on_stack = {root}
+      components = []
+      work = [(root, iter(self.successors(root)))]
+      while work:
+          state, successors = work[-1]
+          for succ in successors:
+              if succ not in index:
+                  index[succ] = low[succ] = len(index)
+                  stack.append(succ)
+                  on_stack.add(succ)
+                  work.append((succ, iter(self.successors(succ))))
+                  break
+              elif succ in on_stack and index[succ] < low[state]:
+                  low[state] = index[succ]
+          else:
+              work.pop()
+              if work and low[state] < low[work[-1][0]]:
+                  low[work[-1][0]] = low[state]
+              if low[state] == index[state]:
+                  component = []
+                  while True:
+                      current = stack.pop()
+                      on_stack.discard(current)
+                      component.append(current)
+                      if current == state:
+                          break
+                  components.append(component)
+      return components
+
+  def is_cyclic(self, task):
+      for component in self.components(task):
+          if len(component) > 1 or component[0] in self.successors(component[0]):
+              return True
+      return False
+
   def is_proper(self, task):
     if not self.proper:
-        goal_trajectories = list()
-        frontier = {task.initial_state:[]}
-        cycle_roots = set()
-        while frontier:
-            state,ancestors = frontier.popitem()
-            action = self.strategy.get(state, None)
-            if action is None:
-                return False
-            else:
-                reached_states = {det_action.apply(state) for det_action in action[1]}
-                for reached_state in reached_states:
-                    if reached_state in ancestors:
-                        cycle_roots.add(reached_state)
-                    elif task.goal_reached(reached_state):
-                        goal_trajectories.append(ancestors)
-                    else:
-                        new_ancestors = ancestors.copy()
-                        new_ancestors.append(state)
-                        frontier[reached_state] = new_ancestors
-        # Every cycle root must be goal reaching
-        for root in cycle_roots:
-            goal_reaching = False
-            for trajectory in goal_trajectories:
-                if root in trajectory:
-                    goal_reaching = True
-                    break
-            if not goal_reaching:
+        # Every reached state must be able to reach a goal state. Since
+        # components come sinks first, a component reaches the goal iff it
+        # has a goal state or an edge to a goal-reaching component.
+        goal_reaching = set()
+        for component in self.components(task):
+            reaches_goal = False
+            for state in component:
+                if task.goal_reached(state):
+                    reaches_goal = True
+                elif self.strategy.get(state, None) is None:
+                    return False
+                elif not reaches_goal:
+                    reaches_goal = not goal_reaching.isdisjoint(self.successors(state))
+            if not reaches_goal:
                 return False
+            goal_reaching.update(component)
         
         self.proper = True
     return self.proper
@@ -0,0 +1,207 @@
+import mmap
+import struct
+import sys
+
+from array import array
+from pathlib import Path
+
+import numpy as np
+
+# Binary file with all the policies (solutions) of a problem, little-endian:
+#   header:  magic, version, number of facts, number of actions, words per state
+#   tables:  facts and action names (length-prefixed UTF-8)
+#   records: one per policy, appended as the solutions are found:
+#            length of the record, best and worst cost, number of states,
+#            states (bitsets over the fact table, words of 64 bits) and
+#            action ids (32 bits) of the strategy
+# Sections start at multiples of 8 bytes, so the loader maps states and
+# actions as arrays without copying them. A record cut short (search
+# killed while writing) is ignored.
+MAGIC = b"BOANDPOL"
+VERSION = 1
+HEADER = struct.Struct("<8sIIII")
+RECORD = struct.Struct("<QddQ")
+# States written at a time
+CHUNK_SIZE = 4096
+
+
+def _padding(size):
+    return -size % 8
+
+def _write_table(out, names):
+    size = 0
+    for name in names:
+        data = name.encode()
+        out.write(struct.pack("<I", len(data)))
+        out.write(data)
+        size += 4 + len(data)
+    out.write(bytes(_padding(size)))
+
+def _read_table(buffer, offset, count):
+    names = []
+    start = offset
+    for _ in range(count):
+        size, = struct.unpack_from("<I", buffer, offset)
+        names.append(bytes(buffer[offset + 4:offset + 4 + size]).decode())
+        offset += 4 + size
+    return names, offset + _padding(offset - start)
+
+
+def write_text_policy(out, items):
+    # Text format of the .boand.NNN.out files: (facts, action name) items
+    for facts, action in items:
+        out.write("If holds: " + "/".join(facts) + "\nExecute: %s\n\n" % action)
+
+
+class PolicyWriter:
+    # Appends the solutions of a search to a policy file, each one as soon
+    # as it is found. The strategy is written in chunks of states, never
+    # held as a whole in memory.
+    def __init__(self, path, task):
+        self.task = task
+        self.words = max(1, (len(task.facts) + 63) // 64)
+        self.out = open(path, "wb")
+        self.out.write(HEADER.pack(MAGIC, VERSION, len(task.facts), len(task.nondet_actions), self.words))
+        _write_table(self.out, task.facts)
+        _write_table(self.out, [action.name for action in task.nondet_actions])
+        self.out.flush()
+
+    def write(self, policy, best, worst):
+        states = policy.strategy
+        size = len(states) * 8 * self.words
+        actions_size = 4 * len(states) + _padding(4 * len(states))
+        self.out.write(RECORD.pack(RECORD.size - 8 + size + actions_size, best, worst, len(states)))
+
+        task_states = self.task.states
+        state_size = 8 * self.words
+        actions = array("I")
+        chunk = []
+        for state, action in states.items():
+            chunk.append(task_states[state].to_bytes(state_size, "little"))
+            actions.append(action[0].id)
+            if len(chunk) == CHUNK_SIZE:
+                self.out.write(b"".join(chunk))
+                chunk = []
+        self.out.write(b"".join(chunk))
+        if sys.byteorder != "little":
+            actions.byteswap()
+        self.out.write(actions.tobytes())
+        self.out.write(bytes(_padding(4 * len(states))))
+        self.out.flush()
+
+    def close(self):
+        self.out.close()
+
+
+class StoredPolicy:
+    # Policy of a policy file: states is a (size, words) array of bitsets
+    # and actions an array of action ids, both views of the mapped file
+    __slots__ = ("best", "worst", "states", "actions", "file")
+
+    def __init__(self, best, worst, states, actions, file):
+        self.best = best
+        self.worst = worst
+        self.states = states
+        self.actions = actions
+        self.file = file
+
+    def __len__(self):
+        return len(self.actions)
+
+    def items(self):
+        # (facts, action name) of each state of the strategy, in the order
+        # they were written
+        decode = self.file.decode
+        actions = self.file.actions
+        for state, action in zip(self.states, self.actions.tolist()):
+            yield decode(state), actions[action]
+
+
+class PolicyFile:
+    # Memory-mapped policy file: only the fact and action tables are read
+    # when opened, the policies are views of the mapping
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, n_facts, n_actions, self.words = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("{} is not a policy file (version {})".format(path, VERSION))
+        offset = HEADER.size + _padding(HEADER.size)
+        self.facts, offset = _read_table(self.map, offset, n_facts)
+        self.actions, offset = _read_table(self.map, offset, n_actions)
+
+        self.policies = []
+        while offset + RECORD.size <= len(self.map):
+            length, best, worst, size = RECORD.unpack_from(self.map, offset)
+            end = offset + 8 + length
+            if end > len(self.map):
+                break
+            offset += RECORD.size
+            states = np.frombuffer(self.map, dtype="<u8", count=size * self.words, offset=offset).reshape(size, self.words)
+            offset += 8 * size * self.words
+            actions = np.frombuffer(self.map, dtype="<u4", count=size, offset=offset)
+            self.policies.append(StoredPolicy(best, worst, states, actions, self))
+            offset = end
+
+    def decode(self, state):
+        # Facts of a bitset row, as StateSpace.decode
+        facts = []
+        for word, bits in enumerate(state.tolist()):
+            while bits:
+                lowest = bits & -bits
+                facts.append(self.facts[64 * word + lowest.bit_length() - 1])
+                bits ^= lowest
+        return frozenset(facts)
+
+    def __len__(self):
+        return len(self.policies)
+
+    def __iter__(self):
+        return iter(self.policies)
+
+    def __getitem__(self, index):
+        return self.policies[index]
+
+    def close(self):
+        # Arrays of the policies still referenced elsewhere keep the mapping
+        # open, it is then released along with them
+        self.policies = []
+        try:
+            self.map.close()
+        except BufferError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_text(path, solution_folder=None):
+    # Converts a policy file to the text format: one .boand.NNN.out file
+    # per policy, next to it unless a folder is given
+    path = Path(path)
+    pname = path.name[:-len(".boand.pol")]
+    folder = Path(solution_folder) if solution_folder is not None else path.parent
+    folder.mkdir(parents=True, exist_ok=True)
+    with PolicyFile(str(path)) as policies:
+        for number, policy in enumerate(policies, 1):
+            with open(folder / "{}.boand.{}.out".format(pname, str(number).zfill(3)), "w") as out:
+                write_text_policy(out, policy.items())
+        return len(policies)
+
+
+def main(argv):
+    # Example call: python planner/policy_file.py <problem>.boand.pol [<output_folder>]
+    if len(argv) < 2 or not argv[1].endswith(".boand.pol"):
+        print("give a .boand.pol file to convert to .boand.NNN.out files")
+        exit()
+    written = write_text(argv[1], argv[2] if len(argv) > 2 else None)
+    print("{} policies written".format(written))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -1,7 +1,11 @@
-from fondutils import determinize
+import hashlib
+import os
+import pickle
+import tempfile
+import time
+from importlib.metadata import version, PackageNotFoundError
 
-from unified_planning.shortcuts import *
-from unified_planning.io import PDDLReader, PDDLWriter
+from fondutils import determinize
 
 from pddl.logic.base import Not, And
 from pddl.logic.effects import AndEffect
@@ -9,23 +13,55 @@ from pddl.logic.predicates import Predicate
 from pddl.action import Action
 from pddl.core import Domain, Problem
 from pddl.formatter import domain_to_string, problem_to_string
+from pddl import parse_domain, parse_problem
 
 from pyperplan.pddl.parser import Parser
 from pyperplan import grounding
 
 
-def get_alloutcome_determinization(domain, problem):
+def import_compiler():
+    # unified-planning takes about a second to import, which is only paid
+    # when a task is not loaded from the task cache
+    from unified_planning.engines import CompilationKind
+    from unified_planning.shortcuts import Compiler
+    from unified_planning.io import PDDLReader, PDDLWriter
+    return CompilationKind, Compiler, PDDLReader, PDDLWriter
+
+
+# Parsed and determinized domains (PDDL strings) of this process, by domain
+# text: a process solving several problems of a domain only does it once
+_parsed_domains = dict()
+_determinized_domains = dict()
+
+def get_determinized_domain(domain, domain_text=None, timings=None):
+    if timings is None:
+        timings = dict()
+    if domain_text is not None and domain_text in _determinized_domains:
+        return _determinized_domains[domain_text]
+    start = time.time()
+    domain_str = domain_to_string(determinize(domain))
+    timings["determinize"] = time.time() - start
+    if domain_text is not None:
+        _determinized_domains[domain_text] = domain_str
+    return domain_str
+
+def get_alloutcome_determinization(domain, problem, timings=None, domain_text=None):
+    # Everything is passed around as PDDL strings, nothing is written to disk.
+    # If given, timings gets the seconds spent in each stage. domain_text
+    # (the PDDL of domain) reuses the determinization of an earlier call.
+    if timings is None:
+        timings = dict()
+
+    CompilationKind, Compiler, PDDLReader, PDDLWriter = import_compiler()
+
     # All-outcome determinization for heuristic
-    detdomain = determinize(domain)
-    with open("aux_domain.pddl", "w") as f:
-        f.write(domain_to_string(detdomain))
-    with open("aux_problem.pddl", "w") as f:
-        f.write(problem_to_string(problem))
+    domain_str = get_determinized_domain(domain, domain_text, timings)
+    problem_str = problem_to_string(problem)
 
     # Compile away negative preconditions for pyperplan
-
+    start = time.time()
     reader = PDDLReader()
-    pddl_problem = reader.parse_problem("aux_domain.pddl", "aux_problem.pddl")
+    pddl_problem = reader.parse_problem_string(domain_str, problem_str)
 
     with Compiler(
         problem_kind=pddl_problem.kind,
@@ -37,15 +73,122 @@ def get_alloutcome_determinization(domain, problem):
         )
 
     writer = PDDLWriter(ncr_result.problem)
-    writer.write_domain("aux_domain.pddl")
-    writer.write_problem("aux_problem.pddl")
-
+    domain_str = writer.get_domain()
+    problem_str = writer.get_problem()
+    timings["compile"] = time.time() - start
 
     # Pyperplan setup
-    parser = Parser("aux_domain.pddl", "aux_problem.pddl")
-    aux_domain = parser.parse_domain()
-    aux_problem = parser.parse_problem(aux_domain)
+    start = time.time()
+    parser = Parser(None)
+    parser.domInput = domain_str
+    parser.probInput = problem_str
+    aux_domain = parser.parse_domain(read_from_file=False)
+    aux_problem = parser.parse_problem(aux_domain, read_from_file=False)
+    timings["parse"] = time.time() - start
 
+    start = time.time()
     task = grounding.ground(aux_problem, True, False)
-    
-    return task
\ No newline at end of file
+    timings["ground"] = time.time() - start
+
+    return task
+
+
+# Grounded tasks of this process, by (domain text, problem text), least
+# recently used first: the same problem under several configurations is
+# only compiled and grounded once. Tasks are only read by the search.
+_grounded_tasks = dict()
+MAX_GROUNDED_TASKS = 4
+
+
+# Bump when the pipeline above changes what it produces
+CACHE_FORMAT = 1
+CACHE_PACKAGES = ["pddl", "fond-utils", "unified-planning", "pyperplan"]
+
+
+def warm_up(domain_file):
+    # Imports the compiler and determinizes the domain, so that processes
+    # forked afterwards start with both
+    import_compiler()
+    with open(domain_file, encoding="utf-8") as f:
+        domain_text = f.read()
+    if domain_text not in _parsed_domains:
+        _parsed_domains[domain_text] = parse_domain(domain_file)
+    get_determinized_domain(_parsed_domains[domain_text], domain_text)
+
+def get_task_key(domain_text, problem_text):
+    # Content address of a grounded task: the PDDL text plus the versions of
+    # every tool of the pipeline
+    digest = hashlib.sha256()
+    digest.update(str(CACHE_FORMAT).encode())
+    for package in CACHE_PACKAGES:
+        try:
+            package_version = version(package)
+        except PackageNotFoundError:
+            package_version = "unknown"
+        digest.update("{}={};".format(package, package_version).encode())
+    for text in [domain_text, problem_text]:
+        digest.update(str(len(text)).encode() + b";")
+        digest.update(text.encode())
+    return digest.hexdigest()
+
+def remember_task(key, task):
+    _grounded_tasks[key] = task
+    while len(_grounded_tasks) > MAX_GROUNDED_TASKS:
+        del _grounded_tasks[next(iter(_grounded_tasks))]
+
+def get_grounded_task(domain_file, problem_file, cache_dir=None, timings=None):
+    # Grounded all-outcome determinization of the FOND task. The last
+    # tasks grounded by the process are reused. With a cache_dir, tasks
+    # are pickled there under get_task_key and later runs on the same files
+    # load them instead of parsing and grounding again.
+    if timings is None:
+        timings = dict()
+
+    start = time.time()
+    with open(domain_file, encoding="utf-8") as f:
+        domain_text = f.read()
+    with open(problem_file, encoding="utf-8") as f:
+        problem_text = f.read()
+
+    key = (domain_text, problem_text)
+    task = _grounded_tasks.pop(key, None)
+    if task is not None:
+        _grounded_tasks[key] = task
+        timings["load"] = time.time() - start
+        return task
+
+    cache_file = None
+    if cache_dir is not None:
+        cache_file = os.path.join(cache_dir, get_task_key(domain_text, problem_text) + ".task")
+        try:
+            with open(cache_file, "rb") as f:
+                task = pickle.load(f)
+            timings["load"] = time.time() - start
+            remember_task(key, task)
+            return task
+        except (OSError, EOFError, pickle.UnpicklingError):
+            pass
+
+    # The parsed domain is kept with its determinization
+    domain = _parsed_domains.get(domain_text, None)
+    if domain is None:
+        domain = parse_domain(domain_file)
+        _parsed_domains[domain_text] = domain
+    problem = parse_problem(problem_file)
+    timings["read"] = time.time() - start
+
+    task = get_alloutcome_determinization(domain, problem, timings, domain_text)
+    remember_task(key, task)
+
+    if cache_file is not None:
+        # Written under a temporary name and renamed, so concurrent runs
+        # never read a partial file
+        start = time.time()
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_file = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(task, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+        timings["store"] = time.time() - start
+
+    return task
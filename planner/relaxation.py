@@ -0,0 +1,77 @@
+import numpy as np
+
+from pyperplan.heuristics.heuristic_base import Heuristic
+
+# Upper bound on the entries of the operators x preconditions x states
+# matrix built by one relaxation step; larger batches are split
+MAX_BATCH_ENTRIES = 1 << 22
+
+
+class BatchRelaxationHeuristic(Heuristic):
+    # hmax (aggregate="max") or hadd (aggregate="sum") over the states of a
+    # StateSpace, evaluating a whole batch of states at once. The fact costs
+    # of the batch are a facts x states matrix, relaxed with matrix
+    # operations until the fixpoint, which is the one computed by the
+    # Dijkstra exploration of pyperplan's hMaxHeuristic/hAddHeuristic, so
+    # the h-values are the same.
+    def __init__(self, space, aggregate="max"):
+        self.space = space
+        self.aggregate = np.max if aggregate == "max" else np.sum
+        self.n_facts = len(space.facts)
+        self.n_bytes = (self.n_facts + 7) // 8
+
+        def index(fact):
+            return space.fact_ids[fact].bit_length() - 1
+
+        # Preconditions padded with a row that always costs 0 (also used
+        # by the operators without preconditions)
+        operators = [op.operator for op in space.operators]
+        max_pre = max([len(op.preconditions) for op in operators], default=0)
+        self.preconditions = np.full((len(operators), max(max_pre, 1)), self.n_facts, dtype=np.intp)
+        for i, op in enumerate(operators):
+            self.preconditions[i, :len(op.preconditions)] = sorted(index(fact) for fact in op.preconditions)
+
+        # (fact, achiever) pairs grouped by fact, for np.minimum.reduceat
+        achievers = sorted((index(fact), i) for i, op in enumerate(operators) for fact in op.add_effects)
+        self.achievers = np.array([i for _, i in achievers], dtype=np.intp)
+        self.achieved = np.array(sorted(set(fact for fact, _ in achievers)), dtype=np.intp)
+        self.achiever_starts = np.searchsorted([fact for fact, _ in achievers], self.achieved)
+
+        self.goals = np.array(sorted(index(fact) for fact in space.task.goals), dtype=np.intp)
+        self.chunk = max(1, MAX_BATCH_ENTRIES // self.preconditions.size)
+
+    def __call__(self, node):
+        # pyperplan interface, node.state being a set of facts
+        bits = self.space.encode(node.state)
+        return self.evaluate_bits([bits])[0]
+
+    def evaluate_batch(self, states):
+        return self.evaluate_bits([self.space.states[state] for state in states])
+
+    def evaluate_bits(self, batch):
+        values = []
+        for start in range(0, len(batch), self.chunk):
+            values += self.relax(batch[start:start+self.chunk])
+        return values
+
+    def relax(self, batch):
+        # Facts of the states: 0, other facts: inf, padding row: 0
+        true_facts = np.zeros((len(batch), self.n_bytes * 8), dtype=np.uint8)
+        for column, bits in enumerate(batch):
+            true_facts[column] = np.unpackbits(np.frombuffer(bits.to_bytes(self.n_bytes, "little"), dtype=np.uint8), bitorder="little")
+        costs = np.zeros((self.n_facts + 1, len(batch)))
+        costs[:self.n_facts] = np.where(true_facts[:, :self.n_facts].T, 0.0, np.inf)
+
+        if len(self.achievers) > 0:
+            while True:
+                operator_costs = self.aggregate(costs[self.preconditions], axis=1) + 1
+                best = np.minimum.reduceat(operator_costs[self.achievers], self.achiever_starts, axis=0)
+                current = costs[self.achieved]
+                if not (best < current).any():
+                    break
+                costs[self.achieved] = np.minimum(current, best)
+
+        if len(self.goals) == 0:
+            return [0] * len(batch)
+        h_values = self.aggregate(costs[self.goals], axis=0)
+        return [int(h) if h != np.inf else float("inf") for h in h_values]
@@ -0,0 +1,138 @@
+import re
+
+from cache import TransitionTable
+
+
+class CompiledOperator:
+    # Grounded operator over interned states: preconditions and effects are
+    # bitsets over the fact table of its StateSpace
+    __slots__ = ("name", "operator", "preconditions", "add_effects", "del_effects", "space")
+
+    def __init__(self, operator, space):
+        self.name = operator.name
+        self.operator = operator
+        self.preconditions = space.encode(operator.preconditions)
+        self.add_effects = space.encode(operator.add_effects)
+        self.del_effects = space.encode(operator.del_effects)
+        self.space = space
+
+    def applicable(self, state):
+        return self.space.states[state] & self.preconditions == self.preconditions
+
+    def apply(self, state):
+        facts = (self.space.states[state] & ~self.del_effects) | self.add_effects
+        return self.space.intern(facts)
+
+    def __repr__(self):
+        return "<Op %s>" % self.name
+
+
+class NondetAction:
+    # Nondeterministic action of the FOND task: the group of deterministic
+    # operators produced for its outcomes by the all-outcome determinization
+    __slots__ = ("id", "name", "operators", "preconditions", "shared_preconditions")
+
+    def __init__(self, id, name):
+        self.id = id
+        self.name = name
+        self.operators = []
+        self.preconditions = None
+        self.shared_preconditions = True
+
+    def add_outcome(self, op):
+        self.operators.append(op)
+        if self.preconditions is None:
+            self.preconditions = op.preconditions
+        elif self.preconditions != op.preconditions:
+            self.shared_preconditions = False
+
+    def __str__(self):
+        return self.name
+
+    def __repr__(self):
+        return "<NondetAction %s>" % self.name
+
+
+class StateSpace:
+    # Interned view of a grounded pyperplan Task. Every reached state gets a
+    # dense int id and is stored once as a bitset of facts, so policies key
+    # their maps on small ints and goal/applicability tests are bit operations.
+    # It exposes the same interface as Task (initial_state, goal_reached,
+    # get_successor_states) with ids in place of frozensets.
+    def __init__(self, task, transition_cache_size=None):
+        self.task = task
+        self.facts = sorted(task.facts)
+        self.fact_ids = {fact: 1 << i for i, fact in enumerate(self.facts)}
+
+        self.states = []
+        self.state_ids = dict()
+
+        self.goals = self.encode(task.goals)
+        self.operators = [CompiledOperator(op, self) for op in task.operators]
+        self.initial_state = self.intern(self.encode(task.initial_state))
+
+        # Nondeterministic action index, in order of first outcome
+        self.nondet_actions = []
+        nondet_actions = dict()
+        for op in self.operators:
+            name = re.sub('_detdup_' + '[0-9]*', '', op.name)
+            nondet_action = nondet_actions.get(name, None)
+            if nondet_action is None:
+                nondet_action = NondetAction(len(self.nondet_actions), name)
+                nondet_actions[name] = nondet_action
+                self.nondet_actions.append(nondet_action)
+            nondet_action.add_outcome(op)
+        for nondet_action in self.nondet_actions:
+            nondet_action.operators = tuple(nondet_action.operators)
+
+        self.transitions = TransitionTable(len(self.nondet_actions), transition_cache_size)
+
+    def encode(self, facts):
+        bits = 0
+        for fact in facts:
+            bits |= self.fact_ids[fact]
+        return bits
+
+    def decode(self, state):
+        bits = self.states[state]
+        facts = []
+        while bits:
+            lowest = bits & -bits
+            facts.append(self.facts[lowest.bit_length() - 1])
+            bits ^= lowest
+        return frozenset(facts)
+
+    def intern(self, bits):
+        state = self.state_ids.get(bits, None)
+        if state is None:
+            state = len(self.states)
+            self.states.append(bits)
+            self.state_ids[bits] = state
+        return state
+
+    def goal_reached(self, state):
+        return self.states[state] & self.goals == self.goals
+
+    def get_successor_states(self, state):
+        bits = self.states[state]
+        return [(op, op.apply(state)) for op in self.operators if bits & op.preconditions == op.preconditions]
+
+    def get_nondet_successors(self, state):
+        # (nondet_action, applicable outcomes, successor states) groups
+        bits = self.states[state]
+        groups = []
+        for nondet_action in self.nondet_actions:
+            if nondet_action.shared_preconditions:
+                pre = nondet_action.preconditions
+                if bits & pre != pre:
+                    continue
+                det_actions = nondet_action.operators
+            else:
+                det_actions = tuple(op for op in nondet_action.operators if bits & op.preconditions == op.preconditions)
+                if not det_actions:
+                    continue
+            groups.append((nondet_action, det_actions, self.transitions.successors(state, nondet_action, det_actions)))
+        return groups
+
+    def __len__(self):
+        return len(self.states)
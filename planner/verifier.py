@@ -0,0 +1,379 @@
+import json
+import multiprocessing
+import sys
+
+from collections import deque
+from pathlib import Path
+
+from policy import CYCLE_COST
+from pareto import ParetoArchive
+from policy_file import PolicyFile
+from preprocessing import get_grounded_task, warm_up
+from states import StateSpace
+
+BENCHMARKS_PATH = Path(__file__).resolve().parent.parent / "benchmarks"
+
+# Folders of the results named differently from their benchmarks folder
+DOMAIN_ALIASES = {"bream-walk": "beam-walk"}
+
+METRICS = ["bw", "wb", "b", "w"]
+
+
+def find_runs(paths, benchmarks_path=BENCHMARKS_PATH):
+    # Solution folders (those with a .stats file) under the paths, grouped
+    # by instance. The domain is the closest enclosing folder named as a
+    # benchmarks domain that has the problem, as in results/<config>/<domain>/...
+    # or the folders of batch.py
+    instances = dict()
+    missing = []
+    for path in paths:
+        for stats_file in sorted(Path(path).rglob("*.stats")):
+            pname = stats_file.stem
+            for folder in stats_file.parents:
+                domain = Path(benchmarks_path) / DOMAIN_ALIASES.get(folder.name, folder.name)
+                if (domain / "domain.pddl").exists() and (domain / (pname + ".pddl")).exists():
+                    key = (str(domain / "domain.pddl"), str(domain / (pname + ".pddl")))
+                    instances.setdefault(key, []).append(str(stats_file.parent))
+                    break
+            else:
+                missing.append(str(stats_file))
+    return instances, missing
+
+
+def get_metric(solution_folder):
+    # Metric of the configuration folder enclosing a solution folder, named
+    # metric_heuristic_best_worst_size_selector (results folders add the
+    # time limit). None if there is no such folder.
+    for folder in Path(solution_folder).parents:
+        parts = folder.name.split("_")
+        if len(parts) in [6, 7] and parts[0] in METRICS:
+            return parts[0]
+    return None
+
+def read_stats(stats_file):
+    # (best, worst) of each solution, and whether the frontier is complete
+    # (final -1 row)
+    rows = [line.split(";") for line in Path(stats_file).read_text().splitlines() if line]
+    complete = bool(rows) and rows[-1][0] == "-1"
+    if complete:
+        rows = rows[:-1]
+    return [(float(row[0]), float(row[1])) for row in rows], complete
+
+def read_text_policy(path):
+    # (facts, action name) items of a .boand.NNN.out file
+    items = []
+    facts = None
+    with open(path) as f:
+        for line in f:
+            if line.startswith("If holds: "):
+                line = line[10:].rstrip("\n")
+                facts = line.split("/") if line else []
+            elif line.startswith("Execute: "):
+                items.append((facts, line[9:].rstrip("\n")))
+    return items
+
+def read_policies(solution_folder, pname):
+    # Policies of a solution folder in the order they were found, from the
+    # .boand.pol file or the .boand.NNN.out files
+    folder = Path(solution_folder)
+    pol_file = folder / (pname + ".boand.pol")
+    if pol_file.exists():
+        with PolicyFile(str(pol_file)) as policies:
+            return [list(policy.items()) for policy in policies]
+    return [read_text_policy(path) for path in sorted(folder.glob(pname + ".boand.[0-9]*.out"))]
+
+
+def normalize(name):
+    # Policies written with other versions of the libraries name facts and
+    # actions as rewritten by the PDDL writer: (at_ tile_3_2) for
+    # (at tile_3_2), up_to_wall for up-to-wall
+    return " ".join(token.replace("-", "_").rstrip("_") for token in name.strip("()").split(" "))
+
+def get_names(names):
+    # Name -> value, also under the normalized names that are not ambiguous.
+    # The negations compiled away (not_up, not_not-flattire) are registered
+    # under their old names too (up_0, not_flattire_0).
+    normalized = dict()
+    for name, value in names.items():
+        key = normalize(name)
+        normalized.setdefault(key, []).append(value)
+        if key.startswith("not_"):
+            predicate, _, arguments = key.partition(" ")
+            old_key = " ".join([predicate[4:] + "_0"] + ([arguments] if arguments else []))
+            normalized.setdefault(old_key, []).append(value)
+    table = {name: values[0] for name, values in normalized.items() if len(values) == 1}
+    table.update(names)
+    return table
+
+def lookup(table, name):
+    value = table.get(name, None)
+    if value is None:
+        value = table.get(normalize(name), None)
+    return value
+
+def get_strategy(task, facts_table, actions_table, items):
+    # State id -> nondet action of a policy, and the errors of its items
+    strategy = dict()
+    errors = []
+    unknown = set()
+    for facts, action_name in items:
+        bits = 0
+        for fact in facts:
+            fact_bit = lookup(facts_table, fact)
+            if fact_bit is None:
+                unknown.add(fact)
+                break
+            bits |= fact_bit
+        else:
+            action = lookup(actions_table, action_name)
+            if action is None:
+                unknown.add(action_name)
+            else:
+                strategy[task.intern(bits)] = action
+    if unknown:
+        errors.append("unknown facts or actions {}".format(", ".join(sorted(unknown))))
+    return strategy, errors
+
+def check_policy(task, strategy):
+    # Closure and properness (strong cyclic) of the policy, and its best and
+    # worst case costs (CYCLE_COST if cyclic). Each pass is linear in the
+    # reached states and transitions:
+    #  - forward BFS from the initial state: reached states and transitions
+    #  - backward BFS from the goal states: states reaching a goal (proper
+    #    iff all of them do) and their distance to the closest one (best)
+    #  - backward Kahn's sort: states not sorted are on or above a cycle,
+    #    longest distance to a goal otherwise (worst)
+    errors = []
+    successors = dict()
+    goals = []
+    queue = deque([task.initial_state])
+    successors[task.initial_state] = ()
+    while queue:
+        state = queue.popleft()
+        if task.goal_reached(state):
+            goals.append(state)
+            continue
+        action = strategy.get(state, None)
+        if action is None:
+            errors.append("not closed: reached state without action")
+            continue
+        bits = task.states[state]
+        next_states = set(op.apply(state) for op in action.operators if bits & op.preconditions == op.preconditions)
+        if not next_states:
+            errors.append("action {} not applicable".format(action.name))
+        successors[state] = next_states
+        for next_state in next_states:
+            if next_state not in successors:
+                successors[next_state] = ()
+                queue.append(next_state)
+
+    predecessors = {state: [] for state in successors}
+    for state, next_states in successors.items():
+        for next_state in next_states:
+            predecessors[next_state].append(state)
+
+    best = {state: 0 for state in goals}
+    queue = deque(goals)
+    while queue:
+        state = queue.popleft()
+        for previous in predecessors[state]:
+            if previous not in best:
+                best[previous] = best[state] + 1
+                queue.append(previous)
+    if len(best) < len(successors):
+        errors.append("not proper: {} reached states cannot reach a goal".format(len(successors) - len(best)))
+
+    worst = {state: 0 for state in goals}
+    remaining = {state: len(next_states) for state, next_states in successors.items()}
+    queue = deque(goals)
+    while queue:
+        state = queue.popleft()
+        for previous in predecessors[state]:
+            worst[previous] = max(worst.get(previous, 0), worst[state] + 1)
+            remaining[previous] -= 1
+            if remaining[previous] == 0:
+                queue.append(previous)
+    # The worst case cost of a policy that is not proper is undefined
+    cyclic = any(remaining.values())
+    if errors:
+        worst = None
+    elif cyclic:
+        worst = CYCLE_COST
+    else:
+        worst = worst[task.initial_state]
+
+    outcome = {
+        "best": best.get(task.initial_state, None),
+        "worst": worst,
+        "size": len(strategy),
+        "reached": len(successors),
+        "unreached": sum(1 for state in strategy if state not in successors)}
+    return outcome, errors
+
+
+def verify_instance(instance):
+    # Grounds the instance once and verifies the policies of all of its
+    # solution folders: each policy, its costs against the .stats rows, the
+    # non-dominance of the frontier of each folder, and complete frontiers
+    # against the valid policies of the other folders
+    domain_file, problem_file, solution_folders, task_cache_dir = instance
+    try:
+        return check_instance(domain_file, problem_file, solution_folders, task_cache_dir)
+    except Exception as e:
+        # The other instances are still verified
+        return [{"domain": domain_file, "problem": problem_file, "output": solution_folder, "policy": None,
+                 "errors": ["error: {}".format(e)]} for solution_folder in solution_folders]
+
+def check_instance(domain_file, problem_file, solution_folders, task_cache_dir):
+    pname = Path(problem_file).stem
+    task = StateSpace(get_grounded_task(domain_file, problem_file, task_cache_dir))
+    facts_table = get_names(task.fact_ids)
+    actions_table = get_names({action.name: action for action in task.nondet_actions})
+
+    records = []
+    frontiers = dict()
+    archive = ParetoArchive()
+    for solution_folder in solution_folders:
+        try:
+            expected, complete = read_stats(Path(solution_folder) / (pname + ".stats"))
+            policies = read_policies(solution_folder, pname)
+        except (OSError, ValueError) as e:
+            records.append({"domain": domain_file, "problem": problem_file, "output": solution_folder, "policy": None,
+                            "complete": False, "errors": ["error: {}".format(e)]})
+            continue
+        run_errors = []
+        if len(policies) != len(expected):
+            run_errors.append("{} policies for {} .stats rows".format(len(policies), len(expected)))
+
+        points = []
+        for number, items in enumerate(policies, 1):
+            strategy, errors = get_strategy(task, facts_table, actions_table, items)
+            if errors:
+                # Unknown names: the strategy is incomplete, its checks
+                # would only fail because of them
+                outcome = {"best": None, "worst": None, "size": len(items), "reached": None, "unreached": None}
+            else:
+                outcome, errors = check_policy(task, strategy)
+            if outcome["best"] is not None and number <= len(expected) and (outcome["best"], outcome["worst"]) != expected[number-1]:
+                errors.append("costs {}/{} differ from .stats {}/{}".format(outcome["best"], outcome["worst"], *expected[number-1]))
+            record = {"domain": domain_file, "problem": problem_file, "output": solution_folder, "policy": number}
+            record.update(outcome)
+            record["errors"] = errors
+            records.append(record)
+            if not errors:
+                points.append((outcome["best"], outcome["worst"], record))
+
+        # Sorted by costs, a point can only be (weakly) dominated by one of
+        # the points before it
+        frontier = ParetoArchive()
+        for best, worst, record in sorted(points, key=lambda point: point[:2]):
+            if frontier.dominates((best, worst)):
+                record["errors"].append("dominated in its frontier")
+            else:
+                frontier.add((best, worst))
+            archive.add((best, worst))
+        metric = get_metric(solution_folder)
+        if complete and metric is not None:
+            frontiers[solution_folder] = (metric, points)
+
+        records.append({"domain": domain_file, "problem": problem_file, "output": solution_folder, "policy": None,
+                        "complete": complete, "errors": run_errors})
+
+    # Complete frontiers: no valid policy (of any folder) strictly dominates
+    # one of their points (bw, wb) or is better in their objective (b, w)
+    pareto_points = set(zip(archive.firsts, archive.seconds))
+    for solution_folder, (metric, points) in frontiers.items():
+        for best, worst, record in points:
+            if metric in ["bw", "wb"] and (best, worst) not in pareto_points:
+                record["errors"].append("complete frontier dominated by another policy")
+            elif metric == "b" and best > archive.firsts[0]:
+                record["errors"].append("best case {} not optimal ({})".format(best, archive.firsts[0]))
+            elif metric == "w" and worst > archive.seconds[-1]:
+                record["errors"].append("worst case {} not optimal ({})".format(worst, archive.seconds[-1]))
+
+    return records
+
+
+def run_verifier(instances, workers=1, task_cache_dir=None):
+    # Instances are verified in this process, or in a pool of workers forked
+    # after the domains are determinized
+    jobs = [(domain_file, problem_file, solution_folders, task_cache_dir)
+            for (domain_file, problem_file), solution_folders in sorted(instances.items())]
+    for domain_file in sorted(set(job[0] for job in jobs)):
+        warm_up(domain_file)
+
+    if workers > 1:
+        pool = multiprocessing.get_context("fork").Pool(workers)
+        results = pool.imap_unordered(verify_instance, jobs)
+    else:
+        pool = None
+        results = map(verify_instance, jobs)
+    try:
+        for records in results:
+            yield records
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+
+def main(argv):
+    # Example call: python planner/verifier.py <solution_path> [<solution_path> ...] -w <workers> -o <report.jsonl>
+
+    paths = []
+    for arg in argv[1:]:
+        if arg.startswith("-"):
+            break
+        paths.append(arg)
+
+    benchmarks_path = BENCHMARKS_PATH
+    if "-bp" in argv:
+        index = argv.index("-bp")
+        benchmarks_path = Path(argv[index+1])
+    workers = 1
+    if "-w" in argv:
+        index = argv.index("-w")
+        workers = int(argv[index+1])
+    task_cache_dir = None
+    if "-gc" in argv:
+        index = argv.index("-gc")
+        task_cache_dir = argv[index+1]
+    report_file = None
+    if "-o" in argv:
+        index = argv.index("-o")
+        report_file = argv[index+1]
+
+    if not paths:
+        print("give the folders of the solutions to verify")
+        exit()
+
+    instances, missing = find_runs(paths, benchmarks_path)
+    for stats_file in missing:
+        print("SKIPPED {}: no domain/problem in {}".format(stats_file, benchmarks_path))
+
+    policies = 0
+    failures = 0
+    out = open(report_file, "w") if report_file is not None else None
+    try:
+        for records in run_verifier(instances, workers, task_cache_dir):
+            for record in records:
+                if record["policy"] is not None:
+                    policies += 1
+                if record["errors"]:
+                    failures += 1
+                    name = record["output"] if record["policy"] is None else "{} #{}".format(record["output"], record["policy"])
+                    print("FAILED {}: {}".format(name, "; ".join(record["errors"])), flush=True)
+                if out is not None:
+                    out.write(json.dumps(record) + "\n")
+    finally:
+        if out is not None:
+            out.close()
+
+    runs = sum(len(solution_folders) for solution_folders in instances.values())
+    print("{} policies of {} runs ({} instances) verified, {} failures".format(policies, runs, len(instances), failures))
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(sys.argv)